@@ -0,0 +1,224 @@
+"""
+姿勢ライブラリから近い姿勢を探す索引
+
+たくさんの姿勢（10^5～10^6個のクオータニオン）から、問い合わせた姿勢に近いものを
+回転角の差（q と -q は同じ回転）で探します
+  nearest(q, k)       近い順にk個
+  radius(q, angle)    回転角の差がangle以内のすべて
+
+クオータニオンを w>=0 の半球にそろえ、4次元の格子に分けてソートしておきます
+問い合わせでは q と -q の周りの格子だけを調べるので、全体との比較はしません
+
+"""
+
+import numpy as np
+
+from Rotation3D import Euler2QuaternionArray
+
+
+CHUNK = 1024        # 1回に調べる問い合わせの数（作業用の配列の大きさを抑える）
+CELLS = 1 << 22     # 格子で調べるときに1回に作る 問い合わせ数×2×格子数 の上限
+BRUTE = 1 << 22     # 全体と比較するときに1回に作る 問い合わせ数×姿勢数 の上限
+
+
+# 格子の番号 [N,4] を1つの整数にする
+def _CellKeys(cells, m):
+    return ((cells[..., 0] * m + cells[..., 1]) * m + cells[..., 2]) * m + cells[..., 3]
+
+
+# 回転角の差（ラジアン）を4次元での距離（弦の長さ）にする  |q1-q2| = 2 sin(θ/4)
+def _Chord(angle):
+    return 2.0 * np.sin(np.minimum(np.asarray(angle, dtype=float), np.pi) / 4.0)
+
+
+# 姿勢の索引
+# q[N,4]=姿勢のクオータニオン (w,x,y,z)（単位でなくてもよい）,
+# cell=格子の幅（4次元での距離、省略時は1格子に8個程度になる幅）
+# 結果の番号は q の行番号
+class AttitudeIndex:
+    def __init__(self, q, cell=None):
+        q = np.atleast_2d(np.asarray(q, dtype=float))
+        q = q / np.linalg.norm(q, axis=1, keepdims=True)
+        q = np.where(q[:, :1] < 0, -q, q)      # w>=0 の半球にそろえる
+        if cell is None:
+            cell = (np.pi**2 * 8.0 / max(len(q), 1)) ** (1.0 / 3.0)
+        self.cell = float(np.clip(cell, 1e-3, 0.5))
+        self.m = int(np.ceil(2.0 / self.cell)) + 1      # 1軸あたりの格子の数
+
+        keys = _CellKeys(self._Cells(q), self.m)
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+        self.quaternions = q
+
+    # 姿勢のクオータニオンとオイラー角から作成
+    # th[N,3]=オイラー角（ラジアンXYZ）, order=回転順
+    @classmethod
+    def FromEuler(cls, th, order, cell=None):
+        return cls(Euler2QuaternionArray(th, order), cell)
+
+    def __len__(self):
+        return len(self.quaternions)
+
+    def _Cells(self, q):
+        return np.floor((q + 1.0) / self.cell).astype(np.int64)
+
+    # 問い合わせ q[Q,4] と -q の周り (2c+1)^4 個の格子にある姿勢
+    # return (問い合わせの番号[M], 姿勢の番号[M])
+    def _Candidates(self, q, c):
+        r = np.arange(-c, c + 1)
+        offsets = np.stack(np.meshgrid(r, r, r, r, indexing='ij'), axis=-1).reshape(-1, 4)
+        qq = np.concatenate([q, -q])
+        cells = self._Cells(qq)[:, None, :] + offsets[None, :, :]
+        valid = np.all((cells >= 0) & (cells < self.m), axis=2)
+        keys = _CellKeys(np.clip(cells, 0, self.m - 1), self.m)
+
+        lo = np.searchsorted(self.keys, keys, 'left')
+        hi = np.searchsorted(self.keys, keys, 'right')
+        counts = np.where(valid, hi - lo, 0).ravel()
+        total = counts.sum()
+        query = np.repeat(np.tile(np.arange(len(q)), 2)[:, None], keys.shape[1], axis=1).ravel()
+        query = np.repeat(query, counts)
+        start = np.repeat(lo.ravel() - (np.cumsum(counts) - counts), counts)
+        return query, self.order[start + np.arange(total)]
+
+    # 周り (2c+1)^4 個の格子を調べるときに1回に調べる問い合わせの数（作業用の配列を CELLS 以下にする）
+    def _Batch(self, c):
+        return max(CELLS // (2 * (2 * c + 1) ** 4), 1)
+
+    # 格子で調べるより全体と比較する方が速いか
+    def _Brute(self, c):
+        return (2 * c + 1) ** 4 * 8 >= len(self) or c * self.cell >= 2.0
+
+    # 全体と比較（格子が多くなりすぎるとき）
+    # return 問い合わせ q[n,4] と全姿勢の |内積| [n,N] を少しずつ
+    def _BruteForce(self, q):
+        step = max(BRUTE // max(len(self), 1), 1)
+        for i in range(0, len(q), step):
+            yield i, np.abs(q[i:i + step] @ self.quaternions.T)
+
+    # 問い合わせの形をそろえる（orderがあればオイラー角）
+    def _Query(self, q, order):
+        if order is not None:
+            q = Euler2QuaternionArray(q, order)
+        q = np.atleast_2d(np.asarray(q, dtype=float))
+        return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+    # 近い順にk個
+    # q[4] または q[Q,4]=問い合わせのクオータニオン
+    #   （orderを指定したときはオイラー角 th[3] または th[Q,3]（ラジアン））,
+    # k=個数
+    # return idx[Q,k] 姿勢の番号, angle[Q,k] 回転角の差（ラジアン）  近い順
+    def nearest(self, q, k=1, order=None):
+        q = self._Query(q, order)
+        k = min(k, len(self))
+        out = [self._Nearest(q[i:i + CHUNK], k) for i in range(0, len(q), CHUNK)]
+        return (np.concatenate([o[0] for o in out]) if out else np.zeros((0, k), dtype=np.int64),
+                np.concatenate([o[1] for o in out]) if out else np.zeros((0, k)))
+
+    def _Nearest(self, q, k):
+        idx = np.zeros((len(q), k), dtype=np.int64)
+        dot = np.full((len(q), k), -1.0)
+
+        todo = np.arange(len(q))
+        c = 1
+        while len(todo) and not self._Brute(c):
+            step = self._Batch(c)
+            done = np.concatenate([self._NearestCells(q, todo[i:i + step], k, c, idx, dot)
+                                   for i in range(0, len(todo), step)])
+            todo = todo[~done]
+            c *= 2
+
+        for i, d in self._BruteForce(q[todo]):
+            rows = todo[i:i + len(d)]
+            part = np.argpartition(-d, k - 1, axis=1)[:, :k]
+            pd = np.take_along_axis(d, part, axis=1)
+            s = np.argsort(-pd, axis=1)
+            idx[rows] = np.take_along_axis(part, s, axis=1)
+            dot[rows] = np.take_along_axis(pd, s, axis=1)
+
+        return idx, 2.0 * np.arccos(np.clip(dot, 0.0, 1.0))
+
+    # 問い合わせ q[rows] の周り (2c+1)^4 個の格子からk個  確定したものを idx, dot に書く
+    # return rows ごとに確定したか
+    def _NearestCells(self, q, rows, k, c, idx, dot):
+        query, lib = self._Candidates(q[rows], c)
+        d = np.abs(np.sum(q[rows][query] * self.quaternions[lib], axis=1))
+
+        # 問い合わせごとに近い順  同じ姿勢（q と -q の両方で見つかったもの）は1つにする
+        s = np.lexsort((lib, -d, query))
+        query, lib, d = query[s], lib[s], d[s]
+        keep = np.ones(len(s), dtype=bool)
+        keep[1:] = (query[1:] != query[:-1]) | (lib[1:] != lib[:-1])
+        query, lib, d = query[keep], lib[keep], d[keep]
+        first = np.searchsorted(query, np.arange(len(rows)))
+        rank = np.arange(len(query)) - first[query]
+        top = rank < k
+        found = np.bincount(query, minlength=len(rows))
+
+        # k個見つかり、k番目が調べた範囲（距離 c*cell）の内側なら確定
+        kth = np.full(len(rows), -1.0)
+        full = found >= k
+        kth[full] = d[first[full] + k - 1]
+        done = full & (np.sqrt(np.maximum(2.0 - 2.0 * kth, 0.0)) <= c * self.cell)
+
+        sel = top & done[query]
+        idx[rows[query[sel]], rank[sel]] = lib[sel]
+        dot[rows[query[sel]], rank[sel]] = d[sel]
+        return done
+
+    # 回転角の差がangle以内のすべて
+    # q, order=nearest参照, angle=回転角の差の上限（ラジアン）
+    # return [(idx[n] 姿勢の番号, angle[n] 回転角の差)] 問い合わせごとのリスト  近い順
+    def radius(self, q, angle, order=None):
+        q = self._Query(q, order)
+        out = []
+        for i in range(0, len(q), CHUNK):
+            out += self._Radius(q[i:i + CHUNK], angle)
+        return out
+
+    def _Radius(self, q, angle):
+        c = max(int(np.ceil(_Chord(angle) / self.cell)), 1)
+        limit = np.cos(min(angle, np.pi) / 2.0)
+
+        if not self._Brute(c):
+            step = self._Batch(c)
+            found = []
+            for i in range(0, len(q), step):
+                qi, li = self._Candidates(q[i:i + step], c)
+                d = np.abs(np.sum(q[i:i + step][qi] * self.quaternions[li], axis=1))
+                m = d >= limit
+                found.append((qi[m] + i, li[m], d[m]))
+            query, lib, d = (np.concatenate(x) for x in zip(*found))
+            s = np.lexsort((lib, -d, query))
+            query, lib, d = query[s], lib[s], d[s]
+            keep = np.ones(len(s), dtype=bool)
+            keep[1:] = (query[1:] != query[:-1]) | (lib[1:] != lib[:-1])
+            query, lib, d = query[keep], lib[keep], d[keep]
+        else:
+            found = []
+            for i, d in self._BruteForce(q):
+                qi, li = np.nonzero(d >= limit)
+                found.append((qi + i, li, d[qi, li]))
+            query, lib, d = (np.concatenate(x) for x in zip(*found))
+            s = np.lexsort((lib, -d, query))
+            query, lib, d = query[s], lib[s], d[s]
+
+        bounds = np.searchsorted(query, np.arange(len(q) + 1))
+        angles = 2.0 * np.arccos(np.clip(d, 0.0, 1.0))
+        return [(lib[a:b], angles[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+# 索引を保存（読み込むときに並べ直さない）
+def SaveAttitudeIndex(path, index):
+    np.savez(path, quaternions=index.quaternions, keys=index.keys, order=index.order, cell=index.cell)
+
+# 保存した索引を読み込み
+def LoadAttitudeIndex(path):
+    with np.load(path) as data:
+        index = AttitudeIndex.__new__(AttitudeIndex)
+        index.quaternions = data['quaternions']
+        index.keys = data['keys']
+        index.order = data['order']
+        index.cell = float(data['cell'])
+        index.m = int(np.ceil(2.0 / index.cell)) + 1
+        return index
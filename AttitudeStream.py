@@ -0,0 +1,239 @@
+"""
+姿勢ログ（オイラー角）のストリーム処理
+
+IMU・フライトログのオイラー角を一定サイズずつ読み込み、
+クオータニオン・回転行列・回転後のモデル座標に変換してファイルまたはコールバックに書き出します
+一度に持つのは chunk サンプル分だけなので、ログの長さに関係なくメモリ使用量は一定です
+
+  ReadEulerCSV / ReadEulerBinary  →  ConvertStream  →  NpyWriter / RawWriter / コールバック
+
+角速度（ジャイロ）のログは積分してクオータニオンの姿勢にしてから同じように変換します
+
+  ReadRateCSV / ReadRateBinary  →  IntegrateStream  →  ConvertStream(order=None)  →  ...
+
+"""
+
+import argparse
+import itertools
+import struct
+import time
+
+import numpy as np
+
+from Rotation3D import EulerOrder, Euler2QuaternionArray, Quaternion2Matrix, QuaternionRotate, RotationCache, \
+    AttitudeIntegrator, plane
+
+
+# CSVのオイラー角を chunk 行ずつ読む
+# path=ファイル, chunk=1回に読む行数,
+# columns=オイラー角の列番号, skiprows=先頭の読み飛ばす行数（ヘッダー）,
+# degrees=Trueなら度、Falseならラジアン
+# yield th[n,3]（ラジアン）
+def ReadEulerCSV(path, chunk=65536, columns=(0,1,2), skiprows=0, delimiter=',', degrees=True):
+    with open(path, 'r') as fp:
+        for _ in range(skiprows):
+            fp.readline()
+        while True:
+            lines = list(itertools.islice(fp, chunk))
+            if not lines:
+                break
+            th = np.loadtxt(lines, dtype=np.float64, delimiter=delimiter, usecols=columns, ndmin=2)
+            yield np.radians(th) if degrees else th
+
+
+# バイナリのオイラー角を chunk サンプルずつ読む（メモリマップ）
+# path=ファイル, chunk=1回に読むサンプル数,
+# dtype=値の型, stride=1サンプルの値の個数, columns=オイラー角の位置,
+# offset=先頭の読み飛ばすバイト数, degrees=Trueなら度
+# yield th[n,3]（ラジアン）
+def ReadEulerBinary(path, chunk=65536, dtype='<f8', stride=3, columns=(0,1,2), offset=0, degrees=True):
+    data = np.memmap(path, dtype=dtype, mode='r', offset=offset)
+    data = data[:len(data) // stride * stride].reshape(-1, stride)
+    for i in range(0, len(data), chunk):
+        th = np.array(data[i:i + chunk, list(columns)], dtype=np.float64)
+        yield np.radians(th) if degrees else th
+
+
+# 角速度（ジャイロ）のCSVを chunk 行ずつ読む
+# columns=(時刻, wx, wy, wz) の列番号, degrees=Trueなら角速度は度/秒,
+# その他はReadEulerCSV参照
+# yield (t[n] 秒, w[n,3] ラジアン/秒)
+def ReadRateCSV(path, chunk=65536, columns=(0,1,2,3), skiprows=0, delimiter=',', degrees=True):
+    for block in ReadEulerCSV(path, chunk, columns, skiprows, delimiter, degrees=False):
+        yield block[:,0], np.radians(block[:,1:]) if degrees else block[:,1:]
+
+
+# 角速度（ジャイロ）のバイナリを chunk サンプルずつ読む（メモリマップ）
+# columns=(時刻, wx, wy, wz) の位置, その他はReadEulerBinary参照
+# yield (t[n] 秒, w[n,3] ラジアン/秒)
+def ReadRateBinary(path, chunk=65536, dtype='<f8', stride=4, columns=(0,1,2,3), offset=0, degrees=True):
+    for block in ReadEulerBinary(path, chunk, dtype, stride, columns, offset, degrees=False):
+        yield block[:,0], np.radians(block[:,1:]) if degrees else block[:,1:]
+
+
+# 角速度のchunkを順に積分
+# source=(時刻[n], 角速度[n,3]) のchunkを返すイテレータ,
+# integrator=AttitudeIntegrator（前回の続きから積分する、省略時は回転なしから）
+# yield q[n,4] 各サンプルの姿勢 (w,x,y,z)
+def IntegrateStream(source, integrator=None):
+    integrator = integrator or AttitudeIntegrator()
+    for t, w in source:
+        yield integrator.update(w, t)
+
+# オイラー角のchunkを順に変換
+# source=オイラー角[n,3]（ラジアン）のchunkを返すイテレータ,
+# order=回転順（Noneならsourceはクオータニオン[n,4]のchunk）,
+# output='quaternion' [n,4] / 'matrix' [n,3,3] / 'points' [n,V,3],
+# model[V,3]=output='points'で回転するモデル（省略時は紙飛行機）,
+# cache=RotationCache（同じ姿勢が続くログで再計算しない、省略時は毎回計算）,
+# points=output='points'で1回に返す サンプル数×頂点数 の上限（chunkを分けて返す、1サンプルは必ず返す）
+# yield 変換結果
+def ConvertStream(source, order, output='quaternion', model=None, cache=None, points=1<<22):
+    if output == 'points':
+        model = np.column_stack(plane([0,0,0])) if model is None else np.asarray(model, dtype=float)
+    elif output not in ('quaternion', 'matrix'):
+        raise ValueError('unknown output: ' + str(output))
+
+    convert = cache.quaternions if cache is not None else Euler2QuaternionArray
+    for th in source:
+        q = th if order is None else convert(th, order)
+        if output == 'quaternion':
+            yield q
+        elif output == 'matrix':
+            yield Quaternion2Matrix(q)
+        else:
+            step = max(points // len(model), 1)
+            for i in range(0, len(q), step):
+                yield QuaternionRotate(q[i:i + step], model)
+
+
+# 長さのわからないデータを.npyに追記して書き出す（最後にヘッダーの形状を書き直す）
+class NpyWriter:
+    _HEADER = 128       # ヘッダーの長さ（64の倍数、形状の桁数に十分な長さ）
+
+    def __init__(self, path, dtype=np.float64):
+        self.fp = open(path, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.shape = None
+        self.count = 0
+        self.fp.write(b'\0' * self._HEADER)
+
+    def __call__(self, block):
+        block = np.ascontiguousarray(block, dtype=self.dtype)
+        if self.shape is None:
+            self.shape = block.shape[1:]
+        elif block.shape[1:] != self.shape:
+            raise ValueError('chunk shape changed: {} != {}'.format(block.shape[1:], self.shape))
+        self.fp.write(block.tobytes())
+        self.count += len(block)
+
+    def close(self):
+        shape = (self.count,) + (self.shape or ())
+        header = "{{'descr': {!r}, 'fortran_order': False, 'shape': {!r}, }}".format(
+            np.lib.format.dtype_to_descr(self.dtype), shape)
+        header = header.ljust(self._HEADER - 10 - 1) + '\n'
+        self.fp.seek(0)
+        self.fp.write(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1'))
+        self.fp.close()
+
+
+# そのままのバイナリで追記して書き出す
+class RawWriter:
+    def __init__(self, path, dtype=np.float64):
+        self.fp = open(path, 'wb')
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+
+    def __call__(self, block):
+        self.fp.write(np.ascontiguousarray(block, dtype=self.dtype).tobytes())
+        self.count += len(block)
+
+    def close(self):
+        self.fp.close()
+
+
+# 書き出し先  .npy / その他のパス（バイナリ） / 関数（chunkごとに呼ぶ）
+def OpenSink(sink, dtype=np.float64):
+    if callable(sink):
+        return sink
+    if str(sink).lower().endswith('.npy'):
+        return NpyWriter(sink, dtype)
+    return RawWriter(sink, dtype)
+
+
+# ストリーム処理の実行
+# source=オイラー角[n,3]（ラジアン）のchunkを返すイテレータ,
+# order, output, model, cache=ConvertStream参照,
+# sink=書き出し先（OpenSink参照、Noneなら書き出さない）,
+# verbose=Trueならchunkごとに処理速度を表示
+# return {'samples': サンプル数, 'seconds': 秒, 'samples_per_sec': サンプル/秒}
+def RunPipeline(source, order, output='quaternion', model=None, sink=None, verbose=False, cache=None):
+    write = None if sink is None else OpenSink(sink)
+    samples = 0
+    start = time.perf_counter()
+    try:
+        for block in ConvertStream(source, order, output, model, cache):
+            if write is not None:
+                write(block)
+            samples += len(block)
+            if verbose:
+                t = time.perf_counter() - start
+                print('{} samples, {:.0f} samples/sec'.format(samples, samples / t if t > 0 else 0.0))
+    finally:
+        if hasattr(write, 'close'):
+            write.close()
+
+    seconds = time.perf_counter() - start
+    return {'samples': samples,
+            'seconds': seconds,
+            'samples_per_sec': samples / seconds if seconds > 0 else 0.0}
+
+
+# コマンドラインから実行
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='オイラー角のログをクオータニオン・回転行列・座標に変換')
+    parser.add_argument('log', help='ログファイル (.csv またはバイナリ)')
+    parser.add_argument('out', help='書き出し先 (.npy またはバイナリ)')
+    parser.add_argument('--order', choices=[o.name for o in EulerOrder], default='XYZ', help='回転順')
+    parser.add_argument('--output', choices=['quaternion', 'matrix', 'points'], default='quaternion')
+    parser.add_argument('--model', help='output=pointsで回転するモデル (MeshLoaderで読める形式)')
+    parser.add_argument('--chunk', type=int, default=65536, help='1回に処理するサンプル数')
+    parser.add_argument('--rates', action='store_true', help='ログが角速度（時刻, wx, wy, wz）で、積分して姿勢にする')
+    parser.add_argument('--frame', choices=['body', 'world'], default='body', help='角速度の座標系')
+    parser.add_argument('--radians', action='store_true', help='ログの角度（角速度）がラジアン')
+    parser.add_argument('--skiprows', type=int, default=0, help='CSVのヘッダー行数')
+    parser.add_argument('--dtype', default='<f8', help='バイナリログの値の型')
+    parser.add_argument('--stride', type=int, default=None, help='バイナリログの1サンプルの値の個数（省略時は3、--ratesのときは4）')
+    parser.add_argument('--cache', type=int, default=0, metavar='SIZE', help='姿勢のキャッシュの数（0ならキャッシュしない）')
+    parser.add_argument('--cache-resolution', type=float, default=1e-5, help='キャッシュで角度を丸める単位（ラジアン）')
+    parser.add_argument('-v', '--verbose', action='store_true')
+    args = parser.parse_args(argv)
+
+    degrees = not args.radians
+    order = EulerOrder[args.order]
+    if args.rates:
+        if args.log.lower().endswith('.csv'):
+            source = ReadRateCSV(args.log, args.chunk, skiprows=args.skiprows, degrees=degrees)
+        else:
+            source = ReadRateBinary(args.log, args.chunk, args.dtype, args.stride or 4, degrees=degrees)
+        source = IntegrateStream(source, AttitudeIntegrator(frame=args.frame))
+        order = None
+    elif args.log.lower().endswith('.csv'):
+        source = ReadEulerCSV(args.log, args.chunk, skiprows=args.skiprows, degrees=degrees)
+    else:
+        source = ReadEulerBinary(args.log, args.chunk, args.dtype, args.stride or 3, degrees=degrees)
+
+    model = None
+    if args.model:
+        from MeshLoader import LoadMesh
+        model = LoadMesh(args.model).vertices
+
+    cache = RotationCache(args.cache, args.cache_resolution) if args.cache > 0 else None
+    stats = RunPipeline(source, order, args.output, model, args.out, args.verbose, cache)
+    print('{samples} samples in {seconds:.2f} s ({samples_per_sec:.0f} samples/sec)'.format(**stats))
+    if cache is not None:
+        print('cache: {hits} hits, {misses} misses, {evictions} evictions'.format(**cache.stats()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+回転の計算と表示フレーム作成の速度計測
+
+オイラー角（スカラー）・回転行列・クオータニオンの各方法で点群を回転する時間を
+点数(7～10^7)・姿勢の数・回転順ごとに計測し、JSONに保存します
+同じ姿勢が繰り返すときの姿勢の作成（RotationCache・AxisStepTable）も計測します
+以前の結果を指定すると比較して、遅くなったものを表示します
+
+  python Benchmark.py --out bench.json
+  python Benchmark.py --out new.json --compare bench.json --threshold 0.2
+
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from Rotation3D import EulerOrder, EulerAngles, EulerAnglesBatch, Euler2Quaternion, Euler2QuaternionArray, \
+    QuaternionMultiply, QuaternionConj, QuaternionRotate, EulerSweep, PlaneTrajectory, EulerMatrix, \
+    RotationCache, AxisStepTable
+
+
+# 回転の方法
+#  scalar             EulerAngles を点・姿勢ごとに呼ぶ（元の方法）
+#  scalar-quaternion  Euler2Quaternion と np.quaternion の R * Q1 * R.conj() を点ごとに計算（元の方法）
+#  matrix             EulerAnglesBatch（回転行列の行列積）
+#  quaternion         Euler2QuaternionArray + QuaternionRotate
+#  sandwich           Euler2QuaternionArray + QuaternionMultiply で q * p * q.conj()
+PATHS = ('scalar', 'scalar-quaternion', 'matrix', 'quaternion', 'sandwich')
+SCALAR_PATHS = ('scalar', 'scalar-quaternion')
+
+
+def _Scalar(points, th, order):
+    return [[EulerAngles(p, t, order) for p in points] for t in th]
+
+def _ScalarQuaternion(points, th, order):
+    out = []
+    for t in th:
+        R = Euler2Quaternion(t, order)
+        Rc = R.conj()
+        out.append([(R * np.quaternion(0, *p) * Rc).imag for p in points])
+    return out
+
+def _Matrix(points, th, order):
+    return EulerAnglesBatch(points, th, order)
+
+def _Quaternion(points, th, order):
+    return QuaternionRotate(Euler2QuaternionArray(th, order), points)
+
+def _Sandwich(points, th, order):
+    q = Euler2QuaternionArray(th, order)[:, None, :]
+    p = np.concatenate([np.zeros((len(points), 1)), points], axis=1)[None, :, :]
+    return QuaternionMultiply(QuaternionMultiply(q, p), QuaternionConj(q))[..., 1:]
+
+_FUNCS = {'scalar': _Scalar, 'scalar-quaternion': _ScalarQuaternion, 'matrix': _Matrix,
+          'quaternion': _Quaternion, 'sandwich': _Sandwich}
+
+
+# 最短時間[秒]（repeat回計測）
+def Measure(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+# 点群の回転の計測
+# sizes=点数, batches=姿勢の数, orders=回転順, paths=PATHS,
+# scalar_max=スカラーの方法で計測する点数×姿勢数の上限,
+# max_elements=点数×姿勢数の上限（メモリ不足を避ける）
+# return 結果のリスト
+def RotationBenchmarks(sizes, batches, orders, paths, repeat=3, scalar_max=10**4, max_elements=2*10**7, seed=0):
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in sizes:
+        points = rng.normal(size=(n, 3))
+        for m in batches:
+            if n * m > max_elements:
+                continue
+            th = rng.uniform(-np.pi, np.pi, (m, 3))
+            for order in orders:
+                for path in paths:
+                    if path in SCALAR_PATHS and n * m > scalar_max:
+                        continue
+                    func = _FUNCS[path]
+                    try:
+                        seconds = Measure(lambda: func(points, th, order), 1 if path in SCALAR_PATHS else repeat)
+                    except ImportError:
+                        continue        # numpy-quaternion がない
+                    results.append({'bench': 'rotate', 'path': path, 'order': order.name,
+                                    'points': n, 'batch': m, 'seconds': seconds,
+                                    'throughput': n * m / seconds})
+    return results
+
+
+# RotationCache・AxisStepTable の結果が EulerMatrix・Euler2QuaternionArray と同じか確認
+# ヒットとミスが混ざってキャッシュから捨てる場合も含む（計測の前に行う）
+# tolerance=許す差（RotationCache の resolution で丸めた分）
+def CheckAttitudes(orders, tolerance=1e-4, seed=0):
+    rng = np.random.default_rng(seed)
+    poses = np.radians(rng.integers(-90, 91, (50, 3)) * 2.0)
+    th = np.zeros((5, 3))
+    th[:, 0] = np.radians([10.0, 30.0, 60.0, 90.0, 121.0])
+    table = AxisStepTable(np.radians(2.0))
+    for order in orders:
+        batches = [th[:4], th]      # 満杯のキャッシュにヒット4つとミス1つ
+        batches += [poses[rng.integers(0, len(poses), rng.integers(1, 12))] for _ in range(200)]
+        cache = RotationCache(maxsize=4)
+        for t in batches:
+            for name, R, q in (('RotationCache', cache.matrices(t, order), cache.quaternions(t, order)),
+                               ('AxisStepTable', table.matrices(t, order), table.quaternions(t, order))):
+                if (np.abs(R - EulerMatrix(t, order)).max() > tolerance or
+                        np.abs(q - Euler2QuaternionArray(t, order)).max() > tolerance):
+                    raise RuntimeError('{} differs from EulerMatrix ({})'.format(name, order.name))
+
+
+# 姿勢（回転行列・クオータニオン）の作成の計測  同じ姿勢が繰り返し出てくるとき
+#  euler-matrix      EulerMatrix
+#  cache-matrix      RotationCache.matrices（全部ヒットする状態）
+#  step-table        AxisStepTable.matrices（2度刻み）
+#  quaternion-array  Euler2QuaternionArray
+#  cache-quaternion  RotationCache.quaternions（全部ヒットする状態）
+#  step-quaternion   AxisStepTable.quaternions（2度刻み）
+# counts=姿勢の数, unique=異なる姿勢の数（結果の points に入れる）
+# return 結果のリスト
+def AttitudeBenchmarks(counts, orders, repeat=3, unique=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    poses = np.radians(rng.integers(-90, 91, (unique, 3)) * 2.0)
+    table = AxisStepTable(np.radians(2.0))
+    results = []
+    for m in counts:
+        th = poses[rng.integers(0, unique, m)]
+        for order in orders:
+            cache = RotationCache(maxsize=max(unique, 1))
+            cache.matrices(poses, order)
+            funcs = {'euler-matrix': lambda: EulerMatrix(th, order),
+                     'cache-matrix': lambda: cache.matrices(th, order),
+                     'step-table': lambda: table.matrices(th, order),
+                     'quaternion-array': lambda: Euler2QuaternionArray(th, order),
+                     'cache-quaternion': lambda: cache.quaternions(th, order),
+                     'step-quaternion': lambda: table.quaternions(th, order)}
+            for path, func in funcs.items():
+                seconds = Measure(func, repeat)
+                results.append({'bench': 'attitude', 'path': path, 'order': order.name,
+                                'points': unique, 'batch': m, 'seconds': seconds,
+                                'throughput': m / seconds})
+    return results
+
+
+# デモのフレーム作成の計測（ディスプレイ不要）
+# frames=描画するフレーム数の上限
+def FrameBenchmarks(orders, repeat=3, frames=20):
+    from PaperAirplaneEuler import EulerClip
+    from PaperAirplaneQuaternion import QuaternionClip
+    from PaperAirplaneRender import HeadlessFigure, PlaneView
+
+    angle = [80.0, 120.0, 60.0]
+    results = []
+    for order in orders:
+        # 姿勢の計算だけ（キャッシュを使わない）
+        n = len(EulerSweep(angle, order).angles)
+        t = Measure(lambda: EulerSweep(angle, order), repeat)
+        results.append({'bench': 'frames', 'path': 'euler-sweep', 'order': order.name,
+                        'points': 7, 'batch': n, 'seconds': t, 'throughput': n / t})
+        n = len(PlaneTrajectory(angle, order, profile='ease-out', cache=False)[0])
+        t = Measure(lambda: PlaneTrajectory(angle, order, profile='ease-out', cache=False), repeat)
+        results.append({'bench': 'frames', 'path': 'quaternion-trajectory', 'order': order.name,
+                        'points': 7, 'batch': n, 'seconds': t, 'throughput': n / t})
+
+    # 描画（Agg）  回転順によらないので1つだけ
+    fig, ax = HeadlessFigure()
+    for name, clip in (('euler-render', EulerClip(EulerSweep(angle, orders[0]), angle)),
+                       ('quaternion-render', QuaternionClip(angle, orders[0]))):
+        view = PlaneView(ax, clip)
+        count = min(frames, len(clip.model))
+
+        def render():
+            for f in range(count):
+                view.update(f)
+                fig.canvas.draw()
+
+        t = Measure(render, repeat)
+        results.append({'bench': 'frames', 'path': name, 'order': orders[0].name,
+                        'points': 7, 'batch': count, 'seconds': t, 'throughput': count / t})
+    return results
+
+
+# 実行環境
+def Environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=sys.path[0] or None).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor()}
+
+
+def _Key(r):
+    return (r['bench'], r['path'], r['order'], r['points'], r['batch'])
+
+# 以前の結果と比較
+# threshold=遅くなったと判定する割合（0.2なら20%以上遅い）
+# return 遅くなった結果のリスト [(結果, 以前の秒, 比)]
+def Compare(results, baseline, threshold=0.2):
+    old = {_Key(r): r for r in baseline}
+    slower = []
+    for r in results:
+        o = old.get(_Key(r))
+        if o is not None and o['seconds'] > 0:
+            ratio = r['seconds'] / o['seconds']
+            if ratio > 1.0 + threshold:
+                slower.append((r, o['seconds'], ratio))
+    return slower
+
+
+# コマンドラインから実行
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='回転の計算と表示フレーム作成の速度計測')
+    parser.add_argument('--out', metavar='PATH', help='結果を保存するJSON')
+    parser.add_argument('--compare', metavar='PATH', help='比較する以前の結果 (JSON)')
+    parser.add_argument('--threshold', type=float, default=0.2, help='遅くなったと判定する割合')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[7, 10**2, 10**3, 10**4, 10**5, 10**6, 10**7], help='点数')
+    parser.add_argument('--batches', type=int, nargs='+', default=[1, 10, 100], help='姿勢の数')
+    parser.add_argument('--orders', nargs='+', choices=[o.name for o in EulerOrder], default=[o.name for o in EulerOrder])
+    parser.add_argument('--paths', nargs='+', choices=PATHS, default=list(PATHS))
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--scalar-max', type=int, default=10**4, help='スカラーの方法で計測する点数×姿勢数の上限')
+    parser.add_argument('--max-elements', type=int, default=2*10**7, help='点数×姿勢数の上限')
+    parser.add_argument('--attitudes', type=int, nargs='+', default=[10**3, 10**4, 10**5, 10**6], help='姿勢の作成を計測する姿勢の数')
+    parser.add_argument('--unique', type=int, default=1000, help='姿勢の作成の計測で異なる姿勢の数')
+    parser.add_argument('--no-attitudes', action='store_true', help='姿勢の作成の計測をしない')
+    parser.add_argument('--no-frames', action='store_true', help='フレーム作成の計測をしない')
+    parser.add_argument('--quick', action='store_true', help='小さい条件だけで計測')
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sizes = [s for s in args.sizes if s <= 10**5]
+        args.batches = [b for b in args.batches if b <= 10]
+        args.attitudes = [a for a in args.attitudes if a <= 10**5]
+        args.repeat = 1
+
+    orders = [EulerOrder[o] for o in args.orders]
+    results = RotationBenchmarks(args.sizes, args.batches, orders, args.paths, args.repeat,
+                                 args.scalar_max, args.max_elements)
+    if not args.no_attitudes:
+        CheckAttitudes(orders)
+        results += AttitudeBenchmarks(args.attitudes, orders, args.repeat, args.unique)
+    if not args.no_frames:
+        results += FrameBenchmarks(orders, args.repeat)
+
+    for r in results:
+        print('{bench:7s} {path:22s} {order} points={points:<9d} batch={batch:<4d} {seconds:10.6f} s {throughput:14.0f} /s'.format(**r))
+
+    if args.out:
+        with open(args.out, 'w') as fp:
+            json.dump({'environment': Environment(), 'results': results}, fp, indent=1)
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)['results']
+        slower = Compare(results, baseline, args.threshold)
+        for r, old, ratio in slower:
+            print('SLOWER x{:.2f}: {bench} {path} {order} points={points} batch={batch} ({:.6f} s -> {seconds:.6f} s)'.format(ratio, old, **r))
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
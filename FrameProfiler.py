@@ -0,0 +1,106 @@
+"""
+アニメーションのフレームごとの処理時間の計測
+
+1フレームを compute（姿勢の計算）, update（描画要素の更新）, draw（描画）, idle（待ち時間）に分けて計測します
+計測しないときは NullProfiler（何もしない）を使うので、ループ内の負担はほぼありません
+
+"""
+
+import csv
+import json
+import time
+
+
+# フレームの処理時間の計測
+#  prof.start()            フレームの開始
+#  prof.lap('compute')     前回からここまでを compute として記録
+#  prof.add('draw', sec)    別に計測した時間（並列書き出しのワーカーなど）を記録
+#  prof.end()              フレームの終了
+#  prof.note(key, value)   フレーム数・収束までの反復回数などの付加情報
+class FrameProfiler:
+    PHASES = ('compute', 'update', 'draw', 'idle')
+
+    def __init__(self):
+        self.records = []       # フレームごとの {phase: 秒}
+        self.meta = {}
+        self._row = None
+        self._t = 0.0
+
+    def start(self):
+        self._row = dict.fromkeys(self.PHASES, 0.0)
+        self._t = time.perf_counter()
+
+    def lap(self, phase):
+        t = time.perf_counter()
+        self._row[phase] = self._row.get(phase, 0.0) + (t - self._t)
+        self._t = t
+
+    def add(self, phase, seconds):
+        self._row[phase] = self._row.get(phase, 0.0) + seconds
+
+    def end(self):
+        self.records.append(self._row)
+        self._row = None
+
+    def note(self, key, value):
+        self.meta[key] = value
+
+    # 計測したフレーム数
+    def frames(self):
+        return len(self.records)
+
+    # 処理ごとの合計・平均・最大[秒]
+    def summary(self):
+        phases = list(self.PHASES) + [p for r in self.records for p in r if p not in self.PHASES]
+        phases = list(dict.fromkeys(phases))
+        result = {'frames': self.frames()}
+        for p in phases:
+            values = [r.get(p, 0.0) for r in self.records]
+            total = sum(values)
+            result[p] = {'total': total,
+                         'mean': total / len(values) if values else 0.0,
+                         'max': max(values) if values else 0.0}
+        result.update(self.meta)
+        return result
+
+    # CSVに保存（1行1フレーム）
+    def SaveCSV(self, path):
+        phases = list(dict.fromkeys(list(self.PHASES) + [p for r in self.records for p in r]))
+        with open(path, 'w', newline='') as fp:
+            writer = csv.writer(fp)
+            writer.writerow(['frame'] + phases)
+            for i, r in enumerate(self.records):
+                writer.writerow([i] + [r.get(p, 0.0) for p in phases])
+
+    # JSONに保存（集計・付加情報・全フレーム）
+    def SaveJSON(self, path):
+        with open(path, 'w') as fp:
+            json.dump({'summary': self.summary(), 'frames': self.records}, fp, indent=1)
+
+    # 拡張子(.csv / .json)で保存形式を選ぶ
+    def save(self, path):
+        if path.lower().endswith('.csv'):
+            self.SaveCSV(path)
+        else:
+            self.SaveJSON(path)
+
+
+# 計測しないとき用（すべて何もしない）
+class NullProfiler:
+    def start(self):
+        pass
+
+    def lap(self, phase):
+        pass
+
+    def add(self, phase, seconds):
+        pass
+
+    def end(self):
+        pass
+
+    def note(self, key, value):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
@@ -0,0 +1,260 @@
+"""
+外部モデル（メッシュ）の読み込みと回転
+
+OBJ / STL / PLY / .npy を連続したfloat配列の頂点[N,3]として読み込みます
+バイナリのSTL・PLYと.npyはファイル全体を読まずにメモリマップします
+RotateMesh はオイラー角・クオータニオン・回転行列で頂点を一定サイズずつ回転します
+
+"""
+
+import os
+from typing import NamedTuple
+
+import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
+
+from Rotation3D import EulerMatrix, Quaternion2Matrix
+
+
+# 読み込んだモデル
+#  vertices[N,3] = 頂点座標（メモリマップ、またはバイナリSTLでは TriangleVertices のことがある）
+#  faces[K,3]    = 三角形の頂点番号（面のないファイル・メモリマップしたバイナリSTLは None）
+class Mesh(NamedTuple):
+    vertices: np.ndarray
+    faces: np.ndarray
+
+
+# バイナリSTLの頂点をメモリマップのまま [N,3] として扱う
+# STLは1つの三角形が50バイトのレコードなので、頂点[N,3]を作るとコピーになる
+# ここでは三角形 [K,3,3] のビューを持ち、切り出した範囲の頂点だけをコピーする
+#  vertices[i:j]  頂点 i～j-1 [j-i,3]（その範囲の三角形だけを読む）
+#  np.asarray(vertices)  全頂点 [N,3]（全体をコピーする）
+# triangles[K,3,3]=三角形ごとの3頂点（メモリマップ）
+class TriangleVertices:
+    def __init__(self, triangles):
+        self.triangles = triangles
+
+    def __len__(self):
+        return len(self.triangles) * 3
+
+    @property
+    def shape(self):
+        return (len(self), 3)
+
+    @property
+    def ndim(self):
+        return 2
+
+    @property
+    def dtype(self):
+        return self.triangles.dtype
+
+    def __getitem__(self, key):
+        if isinstance(key, slice) and key.step in (None, 1):
+            start, stop, _ = key.indices(len(self))
+            stop = max(stop, start)
+            t0 = start // 3
+            block = np.asarray(self.triangles[t0:(stop + 2) // 3]).reshape(-1, 3)
+            return block[start - t0 * 3:stop - t0 * 3]
+        return np.asarray(self)[key]
+
+    def __array__(self, dtype=None, copy=None):
+        v = self.triangles.reshape(-1, 3)
+        return v if dtype is None else v.astype(dtype)
+
+
+# モデルファイルの読み込み
+# path=ファイル (.obj / .stl / .ply / .npy),
+# mmap=Trueならバイナリ形式をメモリマップで読む
+# return Mesh
+def LoadMesh(path, mmap=True):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.npy':
+        v = np.load(path, mmap_mode='r' if mmap else None)
+        if v.ndim != 2 or v.shape[1] != 3:
+            raise ValueError('expected an (N,3) vertex array in ' + path)
+        return Mesh(v, None)
+    elif ext == '.stl':
+        return LoadSTL(path, mmap)
+    elif ext == '.ply':
+        return LoadPLY(path, mmap)
+    elif ext == '.obj':
+        return LoadOBJ(path)
+    raise ValueError('unsupported mesh format: ' + path)
+
+
+# STLの読み込み（バイナリはメモリマップして TriangleVertices、ASCIIはテキストを解析）
+def LoadSTL(path, mmap=True):
+    size = os.path.getsize(path)
+    with open(path, 'rb') as fp:
+        header = fp.read(84)
+    count = int(np.frombuffer(header[80:84], dtype='<u4')[0]) if len(header) == 84 else -1
+
+    if count >= 0 and 84 + count * 50 == size:
+        record = np.dtype([('normal', '<f4', (3,)), ('v', '<f4', (3,3)), ('attr', '<u2')])
+        if mmap:
+            data = np.memmap(path, dtype=record, mode='r', offset=84, shape=(count,))
+            v = TriangleVertices(data['v'])
+        else:
+            data = np.fromfile(path, dtype=record, count=count, offset=84)
+            v = data['v'].reshape(-1, 3)
+    else:
+        # ASCII STL  "vertex x y z" の行だけを集める
+        rows = []
+        with open(path, 'r') as fp:
+            for line in fp:
+                line = line.strip()
+                if line.startswith('vertex'):
+                    rows.append(line.split()[1:4])
+        v = np.array(rows, dtype=np.float32).reshape(-1, 3)
+
+    # STLは3頂点ずつが1つの三角形  メモリマップのときは頂点数と同じ大きさの番号を作らない
+    if isinstance(v, TriangleVertices):
+        return Mesh(v, None)
+    return Mesh(v, np.arange(len(v), dtype=np.int64).reshape(-1, 3))
+
+
+_PLY_TYPES = {'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+              'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+              'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+              'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8'}
+
+# PLYの読み込み（バイナリの頂点はメモリマップ）
+def LoadPLY(path, mmap=True):
+    elements = []       # [名前, 個数, [(プロパティ名, 型, リストの個数の型)]]
+    with open(path, 'rb') as fp:
+        if fp.readline().strip() != b'ply':
+            raise ValueError('not a PLY file: ' + path)
+        fmt = None
+        while True:
+            line = fp.readline()
+            if not line:
+                raise ValueError('unterminated PLY header: ' + path)
+            words = line.decode('ascii').split()
+            if not words:
+                continue
+            if words[0] == 'format':
+                fmt = words[1]
+            elif words[0] == 'element':
+                elements.append([words[1], int(words[2]), []])
+            elif words[0] == 'property':
+                if words[1] == 'list':
+                    elements[-1][2].append((words[4], _PLY_TYPES[words[3]], _PLY_TYPES[words[2]]))
+                else:
+                    elements[-1][2].append((words[2], _PLY_TYPES[words[1]], None))
+            elif words[0] == 'end_header':
+                break
+        offset = fp.tell()
+
+    if elements[0][0] != 'vertex':
+        raise ValueError('PLY files must start with the vertex element: ' + path)
+    names = [p[0] for p in elements[0][2]]
+    nv = elements[0][1]
+    faces = None
+
+    if fmt == 'ascii':
+        cols = [names.index(c) for c in 'xyz']
+        with open(path, 'rb') as fp:
+            fp.seek(offset)
+            v = np.loadtxt(fp, dtype=np.float64, usecols=cols, max_rows=nv, ndmin=2)
+            if len(elements) > 1 and elements[1][0] == 'face':
+                rows = [fp.readline().split() for _ in range(elements[1][1])]
+                faces = _Triangulate([r[1:1 + int(r[0])] for r in rows])
+        return Mesh(v, faces)
+
+    endian = {'binary_little_endian': '<', 'binary_big_endian': '>'}.get(fmt)
+    if endian is None:
+        raise ValueError('unsupported PLY format: ' + str(fmt))
+    if any(p[2] is not None for p in elements[0][2]):
+        raise ValueError('list properties on PLY vertices are not supported: ' + path)
+
+    record = np.dtype([(p[0], endian + p[1]) for p in elements[0][2]])
+    if mmap:
+        data = np.memmap(path, dtype=record, mode='r', offset=offset, shape=(nv,))
+    else:
+        data = np.fromfile(path, dtype=record, count=nv, offset=offset)
+    # x,y,z が同じ型で並んでいれば [N,3] のビューになる（コピーしない）
+    v = structured_to_unstructured(data[['x', 'y', 'z']], copy=False)
+
+    # 三角形だけの面 (count=3) なら固定長のレコードとして読む
+    if len(elements) > 1 and elements[1][0] == 'face' and len(elements[1][2]) == 1:
+        name, itype, ctype = elements[1][2][0]
+        tri = np.dtype([('n', endian + ctype), ('i', endian + itype, (3,))])
+        f = np.fromfile(path, dtype=tri, count=elements[1][1], offset=offset + nv * record.itemsize)
+        if np.all(f['n'] == 3):
+            faces = f['i'].astype(np.int64)
+    return Mesh(v, faces)
+
+
+# OBJの読み込み（テキストなので頂点・面の行だけを解析）
+def LoadOBJ(path):
+    verts = []
+    polys = []
+    with open(path, 'r') as fp:
+        for line in fp:
+            if line.startswith('v '):
+                verts.append(line.split()[1:4])
+            elif line.startswith('f '):
+                polys.append([w.split('/')[0] for w in line.split()[1:]])
+
+    v = np.array(verts, dtype=np.float64).reshape(-1, 3)
+    faces = None
+    if polys:
+        faces = _Triangulate(polys)
+        faces = np.where(faces < 0, faces + len(v), faces - 1)   # OBJは1始まり、負は末尾から
+    return Mesh(v, faces)
+
+
+# 多角形を三角形に分割（扇形）
+def _Triangulate(polys):
+    tris = []
+    for p in polys:
+        p = [int(i) for i in p]
+        for k in range(1, len(p) - 1):
+            tris.append((p[0], p[k], p[k + 1]))
+    return np.array(tris, dtype=np.int64).reshape(-1, 3)
+
+
+# 回転の指定を回転行列にする
+# rotation=回転行列[3,3] / クオータニオン[4] (w,x,y,z) / オイラー角[3]（ラジアン、orderが必要）
+def RotationMatrix(rotation, order=None):
+    r = np.asarray(rotation, dtype=float)
+    if r.shape == (3,3):
+        return r
+    elif r.shape == (4,):
+        return Quaternion2Matrix(r / np.linalg.norm(r))[0]
+    elif r.shape == (3,):
+        if order is None:
+            raise ValueError('order is required for Euler angles')
+        return EulerMatrix(r, order)[0]
+    raise ValueError('rotation must be a 3x3 matrix, a quaternion or an Euler angle triple')
+
+
+# 頂点を回転して平行移動（一定サイズずつ処理するのでメモリに収まらないモデルにも使える）
+# vertices[N,3]=頂点（メモリマップ・TriangleVertices 可）,
+# rotation, order=RotationMatrix参照,
+# offset[3]=回転後に加える位置,
+# chunk=1回に処理する頂点数,
+# out=出力先 [N,3]の配列 / .npyのパス（メモリマップで書き出す） / Noneなら新しい配列
+# return 回転後の頂点[N,3]
+def RotateMesh(vertices, rotation, order=None, offset=None, chunk=1 << 20, out=None):
+    R = RotationMatrix(rotation, order)
+    n = len(vertices)
+    dtype = vertices.dtype if np.issubdtype(vertices.dtype, np.floating) else np.float64
+
+    if out is None:
+        out = np.empty((n, 3), dtype=dtype)
+    elif isinstance(out, (str, os.PathLike)):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=dtype, shape=(n, 3))
+
+    RT = R.T.astype(dtype)
+    offset = None if offset is None else np.asarray(offset, dtype=dtype)
+    for i in range(0, n, chunk):
+        block = np.asarray(vertices[i:i + chunk], dtype=dtype)
+        np.matmul(block, RT, out=out[i:i + chunk])
+        if offset is not None:
+            out[i:i + chunk] += offset      # 位置はブロードキャストで1回で加える
+
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
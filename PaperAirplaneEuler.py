@@ -2,6 +2,7 @@
 紙飛行機の姿勢制御
 
 初期位置からオイラー角で指定した角度へ回転
+回転の計算は Rotation3D、表示は PaperAirplaneRender（matplotlibは表示するときに読み込む）
 
 参考URL
 回転行列、クォータニオン(四元数)、オイラー角の相互変換
@@ -9,197 +10,86 @@
 
 """
 
+import argparse
 import ctypes
-from enum import Enum
-from typing import TYPE_CHECKING
+import time
 
 import numpy as np
-import matplotlib.pyplot as plt
-from mpl_toolkits.mplot3d import Axes3D
-import mpl_toolkits.mplot3d.art3d as art3d
-
-
-class EulerOrder(Enum):
-    XYZ=0
-    XZY=1
-    YXZ=2
-    YZX=3
-    ZXY=4
-    ZYX=5
-
-
-# 紙飛行機モデルの作成
-def plane(offset):
-    # model成分のデータの作成
-    x = [1,-1,-1, 1,  -1,-1, 1]
-    y = [0, 1,-1, 0,   0, 0, 0]
-    z = [0, 0, 0, 0,-0.5, 0, 0]
-
-    mx = list(map(lambda a: a + offset[0], x))
-    my = list(map(lambda b: b + offset[1], y))
-    mz = list(map(lambda c: c + offset[2], z))
-
-    return mx, my, mz
-
-# 回転軸の作成（表示用）
-def axis(offset):
-    # 軸成分のデータの作成
-    x = [1, 0, 0]
-    y = [0, 1, 0]
-    z = [0, 0, 1]
-
-    mx = list(map(lambda a: a + offset[0], x))
-    my = list(map(lambda b: b + offset[1], y))
-    mz = list(map(lambda c: c + offset[2], z))
-
-    return mx, my, mz
-
-# 点(p)の位置をオイラー角(th)で回転
-def EulerAngles(p, th, order):
-    if order == EulerOrder.XYZ:
-        #XYZ
-        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[1])*np.sin(th[2]))*p[1]) + (np.sin(th[1])*p[2])
-        y = ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])+np.cos(th[0])*np.sin(th[2]))*p[0]) + ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[1]))*p[2])
-        z = ((-np.cos(th[0])*np.sin(th[1])*np.cos(th[2])+np.sin(th[0])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])+np.sin(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
-    elif order == EulerOrder.XZY:
-        #XZY
-        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + (-np.sin(th[2])*p[1]) + ((np.sin(th[1])*np.cos(th[2]))*p[2])
-        y = ((np.cos(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[0])*np.sin(th[1]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])-np.sin(th[0])*np.cos(th[1]))*p[2])
-        z = ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])-np.cos(th[0])*np.sin(th[1]))*p[0]) + ((np.sin(th[0])*np.cos(th[2]))*p[1]) + ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[1]))*p[2])
-    elif order == EulerOrder.YXZ:
-        #YXZ
-        x = ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])-np.cos(th[1])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1]))*p[2])
-        y = ((np.cos(th[0])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0]))*p[2])
-        z = ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])-np.sin(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.cos(th[1])*np.cos(th[2])+np.sin(th[1])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
-    elif order == EulerOrder.YZX:
-        #YZX
-        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[0])*np.sin(th[1]))*p[1]) + ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])+np.cos(th[0])*np.sin(th[1]))*p[2])
-        y = ((np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[2]))*p[2])
-        z = ((-np.sin(th[1])*np.cos(th[2]))*p[0]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])+np.sin(th[0])*np.cos(th[1]))*p[1]) + ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[1]))*p[2])
-    elif order == EulerOrder.XYZ.ZXY:
-        #ZXY
-        x = ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[0])*np.sin(th[2]))*p[1]) + ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[1])*np.cos(th[2]))*p[2])
-        y = ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])+np.cos(th[1])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[1])*np.cos(th[2])+np.sin(th[1])*np.sin(th[2]))*p[2])
-        z = ((-np.cos(th[0])*np.sin(th[1]))*p[0]) + ((np.sin(th[0]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
-    elif order == EulerOrder.ZYX:
-        #ZYX
-        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])-np.cos(th[0])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.cos(th[2])+np.sin(th[0])*np.sin(th[2]))*p[2])
-        y = ((np.cos(th[1])*np.sin(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])-np.sin(th[0])*np.cos(th[2]))*p[2])
-        z = ((-np.sin(th[1]))*p[0]) + ((np.sin(th[0])*np.cos(th[1]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
-
-    return x,y,z
+
+from FrameProfiler import FrameProfiler, NULL_PROFILER
+from Rotation3D import EulerOrder, EulerSweep
+
+
+# 表示用のフレーム (PaperAirplaneRender.Clip)
+# sweep=EulerSweepFrames,
+# angle[3]=目標姿勢のオイラー角（度）,
+# texts=追加で表示する文字列
+def EulerClip(sweep, angle, texts=()):
+    from PaperAirplaneRender import Clip
+
+    f = np.arange(len(sweep.axes))
+    return Clip(model=sweep.model,
+                target=sweep.model[-1],
+                vectors=sweep.vectors[f, sweep.axes],
+                labels=tuple('XYZ'[ra] for ra in sweep.axes),
+                texts=tuple(texts) + ('Target Euler Angle: '+format(angle[0],'.1f')+', '+format(angle[1],'.1f')+', '+format(angle[2],'.1f'),))
 
 
 # オイラー角で回転
-def PaperAirplaneEuler(angle, order):
+# angle[3]=目標姿勢のオイラー角（度）,
+# order=回転順,
+# step=1フレームあたりの回転角（度）,
+# pause=軸を切り替えるときに止めるフレーム数,
+# fps=1秒あたりのフレーム数,
+# profiler=FrameProfiler（フレームごとの処理時間を記録する）
+def PaperAirplaneEuler(angle, order, step=2.0, pause=10, fps=10, profiler=None):
+    import matplotlib.pyplot as plt
+    from PaperAirplaneRender import PlaneView
+
+    prof = profiler or NULL_PROFILER
     fig = plt.figure(figsize=(8,6))
     ax = fig.add_subplot(111, projection='3d')
     plt.cla()
 
-    th9 = [0.0]*3
+    # 最終姿勢まで1軸ずつ回転するフレームを先に計算しておく
+    t = time.perf_counter()
+    sweep = EulerSweep(angle, order, step, pause)
+    prof.note('setup', time.perf_counter() - t)
+    prof.note('iterations', len(sweep.angles))
+    clip = EulerClip(sweep, angle, texts=['[F1]:Start/Pause, [ESC]:Stop'])
 
-    offset = [0,0,0]
+    view = PlaneView(ax, clip, blit=True)
+    plt.show(block=False)
 
-    # ベース姿勢のモデル    青色の飛行機
-    x,y,z = plane(offset)  #ベース3D表示用
-    axx,axy,axz = axis(offset)
-
-    # 最終姿勢              赤色の飛行機の位置を設定する
-    th9[0] = angle[0] * np.pi / 180.0
-    th9[1] = angle[1] * np.pi / 180.0
-    th9[2] = angle[2] * np.pi / 180.0
-    
-    x9,y9,z9 = [0]*7,[0]*7,[0]*7    #最終姿勢3D表示用
-    for i in range(7):
-        x9[i],y9[i],z9[i] = EulerAngles([x[i],y[i],z[i]], th9, order)
-    
-    x2,y2,z2 = [0.0]*7, [0.0]*7, [0.0]*7    #移動中3D表示用
-    axx2,axy2,axz2 = [0.0]*3, [0.0]*3, [0.0]*3    #軸表示用
-    speed = 0.0
-
-    angle2 = [0.0, 0.0, 0.0]
-    th2 = [0.0, 0.0, 0.0]
-
-    # 回転順を配列順に並べる
-    if order == EulerOrder.XYZ:   od = [0,1,2]
-    elif order == EulerOrder.XZY: od = [0,2,1]
-    elif order == EulerOrder.YXZ: od = [1,0,2]
-    elif order == EulerOrder.YZX: od = [1,2,0]
-    elif order == EulerOrder.ZXY: od = [2,0,1]
-    elif order == EulerOrder.ZYX: od = [2,1,0]
-    OrderNo = 0
-    ra = od[OrderNo]
+    running = False
+    f = 0
 
     while True:
-        plt.cla()
-        
-        # 軸で回転
-        if angle[ra] >= angle2[ra]:
-            angle2[ra] += speed
-            if angle2[ra] >= angle[ra]:
-                angle2[ra] = angle[ra]
+        prof.start()
+        prof.lap('compute')     # 姿勢は計算済み
 
-        th2[0] = angle2[0] * np.pi / 180.0
-        th2[1] = angle2[1] * np.pi / 180.0
-        th2[2] = angle2[2] * np.pi / 180.0
+        # 計算済みのフレームの座標に更新して表示
+        view.update(f)
+        prof.lap('update')
+        view.draw()
+        prof.lap('draw')
 
-        for i in range(7):
-            x2[i],y2[i],z2[i] = EulerAngles([x[i],y[i],z[i]], th2, order)   #青い紙飛行機
-
-        for i in range(3):
-            axx2[i],axy2[i],axz2[i] = EulerAngles([axx[i],axy[i],axz[i]], th2, order)   # 回転軸のベクトル用
-
-
-        # ----- 以下 グラフ表示用 -----
-        # 設定した目標位置 赤い紙飛行機
-        poly1 = list(zip(x9[:4],y9[:4],z9[:4]))
-        ax.add_collection3d(art3d.Poly3DCollection([poly1], color='red', linewidths=0.3, alpha=0.02))
-        poly2 = list(zip(x9[3:7],y9[3:7],z9[3:7]))
-        ax.add_collection3d(art3d.Poly3DCollection([poly2], color='brown', linewidths=0.3, alpha=0.02))
-
-        # 回転中のモデル
-        poly3 = list(zip(x2[:4],y2[:4],z2[:4]))
-        ax.add_collection3d(art3d.Poly3DCollection([poly3], color='blue', alpha=0.5))
-        poly4 = list(zip(x2[3:7],y2[3:7],z2[3:7]))
-        ax.add_collection3d(art3d.Poly3DCollection([poly4], color='midnightblue', alpha=0.5))
-        #ax.scatter(x2[:7], y2[:7], z2[:7], color='blue')       #点を表示
-
-        
-        # 回転軸のベクトルをプロット
-        ax.quiver(offset[0], offset[1], offset[2], axx2[ra], axy2[ra], axz2[ra], color = "orange", length = 2, arrow_length_ratio = 0.2)
-        if ra == 0:   vectorText = 'X'
-        elif ra == 1: vectorText = 'Y'
-        elif ra == 2: vectorText = 'Z'
-        ax.text(axx2[ra]*2, axy2[ra]*2, axz2[ra]*2, vectorText, fontsize=9, color='orange')
-
-        # グラフのエリア設定
-        ax.set_xlabel("x");     ax.set_ylabel("y");     ax.set_zlabel("z")
-        ax.set_xlim(-2,2);      ax.set_ylim(-2,2);      ax.set_zlim(-2,2)
-        ax.set_box_aspect((1,1,1))
-        #ax.tick_params(labelbottom=False, labelleft=False, labelright=False, labeltop=False)
-        ax.text(-1,-1,-2,'[F1]:Start/Pause, [ESC]:Stop', fontsize=9)
-        ax.text(-1,-1,-2.3, 'Target Euler Angle: '+format(angle[0],'.1f')+', '+format(angle[1],'.1f')+', '+format(angle[2],'.1f'), fontsize=9)
-
-
-        if angle2[ra] == angle[ra]:
-            if OrderNo < 2:
-                OrderNo = OrderNo + 1
-                ra = od[OrderNo]
-                plt.pause(1)
-            else:
-                break
-        else:
-            plt.pause(0.1)
+        if f == len(sweep.angles) - 1:
+            prof.end()
+            break
+        if running:
+            f += 1
+        view.wait(1.0 / fps)
+        prof.lap('idle')
+        prof.end()
 
         if getkey(F1):
-            if speed == 0.0:
-                speed = 2.0
-            else:
-                speed = 0.0
+            running = not running
         
         if getkey(ESC):
             break
     
+    print(view.report())
     plt.show()
 
 
@@ -209,6 +99,49 @@ F1 = 0x70   #F1キー
 def getkey(key):
     return(bool(ctypes.windll.user32.GetAsyncKeyState(key) & 0x8000))
 
-angle = [20.0, 30.0, 40.0]
-order = EulerOrder.XYZ
-PaperAirplaneEuler(angle, order)
+# 動画・連番PNGに書き出し（ディスプレイ不要、待ち時間なし）
+# angle, order, step, pause=PaperAirplaneEuler参照,
+# path, fps, size, dpi=PaperAirplaneRender.ExportClip参照
+# profiler=FrameProfiler,
+# workers=描画するプロセス数（1なら並列にしない、None/0ならCPU数）
+# return 書き出したフレーム数
+def PaperAirplaneEulerExport(angle, order, path, step=2.0, pause=10, fps=10, size=(800,600), dpi=100, profiler=None, workers=1):
+    from PaperAirplaneRender import ExportClip
+
+    prof = profiler or NULL_PROFILER
+    t = time.perf_counter()
+    sweep = EulerSweep(angle, order, step, pause)
+    prof.note('setup', time.perf_counter() - t)
+    prof.note('iterations', len(sweep.angles))
+    return ExportClip(EulerClip(sweep, angle), path, fps, size, dpi, profiler, workers)
+
+
+# コマンドラインから実行
+def main(argv=None):
+    angle = [20.0, 30.0, 40.0]
+    order = EulerOrder.XYZ
+
+    parser = argparse.ArgumentParser(description='紙飛行機をオイラー角で回転')
+    parser.add_argument('--angle', type=float, nargs=3, default=angle, help='目標姿勢のオイラー角（度）')
+    parser.add_argument('--order', choices=[o.name for o in EulerOrder], default=order.name, help='回転順')
+    parser.add_argument('--step', type=float, default=2.0, help='1フレームあたりの回転角（度）')
+    parser.add_argument('--pause', type=int, default=10, help='軸を切り替えるときに止めるフレーム数')
+    parser.add_argument('--export', metavar='PATH', help='表示せずに書き出す (.mp4 / .gif / .png連番)')
+    parser.add_argument('--fps', type=float, default=10)
+    parser.add_argument('--size', type=lambda s: tuple(int(v) for v in s.split('x')), default=(800,600), help='幅x高さ（ピクセル）')
+    parser.add_argument('--dpi', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=1, help='書き出しで並列に描画するプロセス数（0ならCPU数）')
+    parser.add_argument('--timings', metavar='PATH', help='フレームごとの処理時間を保存 (.csv / .json)')
+    args = parser.parse_args(argv)
+
+    profiler = FrameProfiler() if args.timings else None
+    if args.export:
+        PaperAirplaneEulerExport(args.angle, EulerOrder[args.order], args.export, args.step, args.pause, args.fps, args.size, args.dpi, profiler, args.workers)
+    else:
+        PaperAirplaneEuler(args.angle, EulerOrder[args.order], args.step, args.pause, args.fps, profiler)
+    if profiler:
+        profiler.save(args.timings)
+
+
+if __name__ == '__main__':
+    main()
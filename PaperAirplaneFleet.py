@@ -0,0 +1,231 @@
+"""
+たくさんの紙飛行機の姿勢をまとめて動かす
+
+N機分の位置・現在の姿勢・目標姿勢・回転順・速さをNumPy配列で持ち（structure of arrays）
+1回の step で全機を同時に1フレーム進めます
+  mode='quaternion'  開始姿勢から目標姿勢まで slerp で回転
+  mode='euler'       PaperAirplaneEuler と同じく回転順に1軸ずつ回転
+表示は全機を1つの Poly3DCollection にまとめて描画します
+
+"""
+
+import argparse
+
+import numpy as np
+
+from FrameProfiler import FrameProfiler, NULL_PROFILER
+from Rotation3D import EulerOrder, EulerMatrix, Euler2QuaternionArray, Quaternion2Matrix, OrderAxes, plane
+
+
+# 回転順ごとの回転する軸の並び [6,3]（EulerOrder.value 順）
+ORDER_AXES = np.array([OrderAxes(EulerOrder(i)) for i in range(len(EulerOrder))])
+
+
+# 回転順を番号の配列にする（EulerOrder または番号）
+def OrderCodes(orders, n):
+    if isinstance(orders, EulerOrder) or np.isscalar(orders):
+        orders = [orders] * n
+    return np.array([getattr(o, 'value', o) for o in orders], dtype=np.int64)
+
+
+# 回転順が混ざったオイラー角を回転順ごとにまとめて計算
+# func=EulerMatrix / Euler2QuaternionArray, th[N,3]=オイラー角（ラジアン）, codes[N]=回転順の番号
+def _ByOrder(func, th, codes, shape):
+    out = np.empty((len(th),) + shape)
+    for code in np.unique(codes):
+        m = codes == code
+        out[m] = func(th[m], EulerOrder(code))
+    return out
+
+
+# 行ごとの球面線形補間
+# q0[N,4], q1[N,4]=開始・終了 (w,x,y,z), t[N]=補間位置
+def SlerpRows(q0, q1, t):
+    t = np.asarray(t, dtype=float)[:, None]
+    d = np.sum(q0 * q1, axis=1, keepdims=True)
+    omega = np.arccos(np.clip(d, -1.0, 1.0))
+    so = np.sin(omega)
+    small = so < 1e-6       # ほぼ同じ姿勢は線形補間
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = np.where(small, 1.0 - t, np.sin((1.0 - t) * omega) / so)
+        b = np.where(small, t, np.sin(t * omega) / so)
+    q = a * q0 + b * q1
+    return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+
+# N機の紙飛行機
+# offsets[N,3]=各機の位置,
+# targets[N,3]=目標姿勢のオイラー角（度）,
+# orders=回転順（EulerOrder 1つ、またはN個）,
+# speeds=1フレームあたりの回転角（度、スカラーまたは[N]）,
+# starts[N,3]=開始姿勢のオイラー角（度、省略時は0）,
+# mode='quaternion' / 'euler',
+# cache=RotationCache（同じ姿勢の回転行列・クオータニオンを再利用する、省略時は毎回計算）
+class Fleet:
+    def __init__(self, offsets, targets, orders=EulerOrder.XYZ, speeds=5.0, starts=None, mode='quaternion', cache=None):
+        self.offsets = np.asarray(offsets, dtype=float).reshape(-1, 3)
+        n = len(self.offsets)
+        self.targets = np.asarray(targets, dtype=float).reshape(n, 3)
+        self.starts = np.zeros((n, 3)) if starts is None else np.asarray(starts, dtype=float).reshape(n, 3)
+        self.orders = OrderCodes(orders, n)
+        self.speeds = np.broadcast_to(np.asarray(speeds, dtype=float), (n,)).copy()
+        self.mode = mode
+        self.cache = cache
+        self.model = np.column_stack(plane([0,0,0]))
+        self.frame = 0
+
+        if mode == 'quaternion':
+            func = cache.quaternions if cache is not None else Euler2QuaternionArray
+            self.q0 = _ByOrder(func, np.radians(self.starts), self.orders, (4,))
+            self.q1 = _ByOrder(func, np.radians(self.targets), self.orders, (4,))
+            d = np.sum(self.q0 * self.q1, axis=1)
+            self.q1[d < 0] *= -1.0          # 最短経路で回転する
+            self.rotation = np.degrees(2.0 * np.arccos(np.clip(np.abs(d), 0.0, 1.0)))
+            self.progress = np.where(self.rotation > 0, 0.0, 1.0)
+            self.current = self.q0.copy()
+        elif mode == 'euler':
+            self.angles = self.starts.copy()
+            self.stage = np.zeros(n, dtype=np.int64)        # 回転中の軸が回転順の何番目か（3で完了）
+            self._Advance(np.zeros(n))
+        else:
+            raise ValueError('unknown mode: ' + str(mode))
+
+    def __len__(self):
+        return len(self.offsets)
+
+    # 全機が目標姿勢に着いたか
+    def done(self):
+        if self.mode == 'quaternion':
+            return bool(np.all(self.progress >= 1.0))
+        return bool(np.all(self.stage >= 3))
+
+    # 全機を1フレーム進める
+    def step(self):
+        if self.mode == 'quaternion':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                inc = np.where(self.rotation > 0, self.speeds / self.rotation, 1.0)
+            self.progress = np.minimum(self.progress + inc, 1.0)
+            self.current = SlerpRows(self.q0, self.q1, self.progress)
+        else:
+            self._Advance(self.speeds)
+        self.frame += 1
+
+    # 1軸ずつ回転（着いた軸は次の軸へ、回転のいらない軸は飛ばす）
+    def _Advance(self, speeds):
+        idx = np.arange(len(self))
+        active = self.stage < 3
+        ra = ORDER_AXES[self.orders, np.minimum(self.stage, 2)]
+        delta = self.targets[idx, ra] - self.angles[idx, ra]
+        move = np.sign(delta) * np.minimum(np.abs(delta), speeds)
+        self.angles[idx[active], ra[active]] += move[active]
+
+        reached = active & (np.abs(delta) <= speeds)
+        self.angles[idx[reached], ra[reached]] = self.targets[idx[reached], ra[reached]]
+        self.stage = self.stage + reached
+        # 目標と同じ角度の軸は待たずに次へ
+        for _ in range(2):
+            s = np.minimum(self.stage, 2)
+            ra = ORDER_AXES[self.orders, s]
+            skip = (self.stage < 3) & (self.angles[idx, ra] == self.targets[idx, ra])
+            self.stage = self.stage + skip
+
+    # 現在の姿勢
+    # return quaternion: [N,4] (w,x,y,z) / euler: [N,3] オイラー角（度）
+    def attitudes(self):
+        if self.mode == 'quaternion':
+            return self.current.copy()
+        return self.angles.copy()
+
+    # 現在の回転行列[N,3,3]
+    def matrices(self):
+        if self.mode == 'quaternion':
+            return Quaternion2Matrix(self.current)
+        func = self.cache.matrices if self.cache is not None else EulerMatrix
+        return _ByOrder(func, np.radians(self.angles), self.orders, (3,3))
+
+    # 全機の頂点[N,7,3]（回転して位置を加える）
+    def vertices(self):
+        R = self.matrices()
+        return np.matmul(self.model, R.transpose(0, 2, 1)) + self.offsets[:, None, :]
+
+    # 全機の面[2N,4,3]  各機の2枚の面を並べる（1つのPoly3DCollection用）
+    def polygons(self):
+        V = self.vertices()
+        return np.concatenate([V[:, None, :4], V[:, None, 3:7]], axis=1).reshape(-1, 4, 3)
+
+    # framesフレーム分を先に計算
+    # return [F,N,4] または [F,N,3]（attitudes 参照）
+    def run(self, frames):
+        out = np.empty((frames,) + self.attitudes().shape)
+        for f in range(frames):
+            self.step()
+            out[f] = self.attitudes()
+        return out
+
+
+# ランダムな目標姿勢のN機を格子状に並べる
+# n=機数, spacing=間隔, seed=乱数の種, その他はFleet参照
+def RandomFleet(n, spacing=3.0, seed=0, mode='quaternion', speed=5.0):
+    rng = np.random.default_rng(seed)
+    side = int(np.ceil(np.sqrt(n)))
+    i = np.arange(n)
+    offsets = np.column_stack([(i % side) * spacing, (i // side) * spacing, np.zeros(n)])
+    offsets[:, :2] -= (side - 1) * spacing / 2.0
+    targets = rng.uniform(-180.0, 180.0, (n, 3))
+    orders = rng.integers(0, 6, n)
+    speeds = speed * rng.uniform(0.5, 1.5, n)
+    return Fleet(offsets, targets, orders, speeds, mode=mode)
+
+
+# 全機の動きを表示
+# fleet=Fleet, fps=1秒あたりのフレーム数, profiler=FrameProfiler
+def PaperAirplaneFleet(fleet, fps=30, profiler=None):
+    import matplotlib.pyplot as plt
+    from PaperAirplaneRender import FleetView
+
+    prof = profiler or NULL_PROFILER
+    fig = plt.figure(figsize=(8,6))
+    ax = fig.add_subplot(111, projection='3d')
+    view = FleetView(ax, fleet, blit=True)
+    plt.show(block=False)
+
+    while True:
+        prof.start()
+        fleet.step()
+        polys = fleet.polygons()
+        prof.lap('compute')
+        view.update(polys)
+        prof.lap('update')
+        view.draw()
+        prof.lap('draw')
+        if fleet.done():
+            prof.end()
+            break
+        view.wait(1.0 / fps)
+        prof.lap('idle')
+        prof.end()
+
+    prof.note('iterations', fleet.frame)
+    print(view.report())
+    plt.show()
+
+
+# コマンドラインから実行
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='たくさんの紙飛行機をまとめて回転')
+    parser.add_argument('--n', type=int, default=1000, help='機数')
+    parser.add_argument('--mode', choices=['quaternion', 'euler'], default='quaternion')
+    parser.add_argument('--speed', type=float, default=5.0, help='1フレームあたりの回転角（度）')
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timings', metavar='PATH', help='フレームごとの処理時間を保存 (.csv / .json)')
+    args = parser.parse_args(argv)
+
+    profiler = FrameProfiler() if args.timings else None
+    PaperAirplaneFleet(RandomFleet(args.n, seed=args.seed, mode=args.mode, speed=args.speed), args.fps, profiler)
+    if profiler:
+        profiler.save(args.timings)
+
+
+if __name__ == '__main__':
+    main()
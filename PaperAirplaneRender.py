@@ -0,0 +1,395 @@
+"""
+紙飛行機のアニメーション描画・書き出し
+
+PaperAirplaneEuler / PaperAirplaneQuaternion で計算済みのフレーム(Clip)を描画します
+PlaneView は描画要素を1回だけ作り、フレームごとに座標だけ更新します（blit対応）
+ExportClip はディスプレイのない環境でもAggで動画(MP4/GIF)・連番PNGに書き出します
+（plt.pause などの待ち時間なし  workers>1 でフレームを複数プロセスで並列に描画）
+
+"""
+
+import os
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+import matplotlib
+from matplotlib import animation
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import mpl_toolkits.mplot3d.art3d as art3d
+
+from FrameProfiler import NULL_PROFILER
+
+
+# 描画する全フレーム
+#  model[F,7,3]  = 各フレームの回転中の紙飛行機（青色）
+#  target[7,3]   = 目標姿勢の紙飛行機（赤色）
+#  vectors[F,3]  = 各フレームの回転軸のベクトル
+#  labels[F]     = 回転軸のラベル（'' なら表示しない）
+#  texts         = 画面下に表示する文字列（下の行が最後）
+class Clip(NamedTuple):
+    model: np.ndarray
+    target: np.ndarray
+    vectors: np.ndarray
+    labels: tuple
+    texts: tuple
+
+
+# 矢印の線分（quiverの代わり  矢じりも含めて線分の座標だけを更新する）
+# v[3]=ベクトル, length=長さ, ratio=矢じりの長さの比
+# return [3][2,3] 軸と矢じり2本の線分
+def ArrowSegments(v, length=2.0, ratio=0.2):
+    v = np.asarray(v, dtype=float)
+    n = np.linalg.norm(v)
+    if n == 0:
+        return [np.zeros((2,3))] * 3
+    d = v / n
+    tip = d * length
+
+    # 矢印に垂直な方向
+    e = np.eye(3)[np.argmin(np.abs(d))]
+    u = np.cross(d, e)
+    u /= np.linalg.norm(u)
+
+    head = ratio * length
+    a = np.radians(15.0)
+    return [np.array([np.zeros(3), tip]),
+            np.array([tip, tip - head * (np.cos(a) * d + np.sin(a) * u)]),
+            np.array([tip, tip - head * (np.cos(a) * d - np.sin(a) * u)])]
+
+
+# 紙飛行機の表示
+# 描画要素(Poly3DCollection, 矢印, 文字)は最初に1回だけ作り、フレームごとに座標だけ更新する
+# ax=3Dのaxes, clip=Clip,
+# blit=Trueでバックエンドが対応していれば動く部分だけ再描画する
+class PlaneView:
+    def __init__(self, ax, clip, blit=False):
+        self._Setup(ax, blit)
+        self.clip = clip
+
+        # グラフのエリア設定
+        ax.cla()
+        ax.set_xlabel("x");     ax.set_ylabel("y");     ax.set_zlabel("z")
+        ax.set_xlim(-2,2);      ax.set_ylim(-2,2);      ax.set_zlim(-2,2)
+        ax.set_box_aspect((1,1,1))
+        for i, text in enumerate(clip.texts):
+            ax.text(-1,-1,-2.3 + 0.3*(len(clip.texts)-1-i), text, fontsize=9)
+
+        # 設定した目標位置 赤い紙飛行機
+        ax.add_collection3d(art3d.Poly3DCollection([clip.target[:4]], color='red', linewidths=0.3, alpha=0.02))
+        ax.add_collection3d(art3d.Poly3DCollection([clip.target[3:7]], color='brown', linewidths=0.3, alpha=0.02))
+
+        # 回転中のモデル・回転軸（座標はupdateで設定）
+        self.poly3 = art3d.Poly3DCollection([clip.model[0][:4]], color='blue', alpha=0.5)
+        self.poly4 = art3d.Poly3DCollection([clip.model[0][3:7]], color='midnightblue', alpha=0.5)
+        ax.add_collection3d(self.poly3)
+        ax.add_collection3d(self.poly4)
+        self.arrow = art3d.Line3DCollection(ArrowSegments(clip.vectors[0]), colors='orange')
+        ax.add_collection3d(self.arrow)
+        self.label = ax.text(0, 0, 0, '', fontsize=9, color='orange')
+
+        self._Animate([self.poly3, self.poly4, self.arrow, self.label])
+        self.update(0)
+
+    def _Setup(self, ax, blit):
+        self.ax = ax
+        self.canvas = ax.figure.canvas
+        self.blit = blit and self.canvas.supports_blit
+        self.background = None
+
+        # 表示速度の計測用
+        self.frames = 0
+        self.late = 0
+        self.start = None
+        self.last = None
+        self.interval = None
+
+    # フレームごとに動く描画要素
+    def _Animate(self, artists):
+        self.artists = artists
+        if self.blit:
+            for a in self.artists:
+                a.set_animated(True)
+            # 再描画（ウィンドウのサイズ変更・視点変更など）のたびに背景を取り直す
+            self.canvas.mpl_connect('draw_event', self._OnDraw)
+
+    def _OnDraw(self, event):
+        self.background = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        self._DrawArtists()
+
+    def _DrawArtists(self):
+        for a in self.artists:
+            if hasattr(a, 'do_3d_projection'):
+                a.do_3d_projection()
+            self.ax.draw_artist(a)
+
+    # フレーム(f)の座標に更新
+    def update(self, f):
+        clip = self.clip
+        self.poly3.set_verts([clip.model[f][:4]])
+        self.poly4.set_verts([clip.model[f][3:7]])
+
+        v = clip.vectors[f]
+        self.arrow.set_segments(ArrowSegments(v))
+        self.label.set_text(clip.labels[f])
+        self.label.set_position_3d((v[0]*2, v[1]*2, v[2]*2))
+
+    # 画面に反映
+    def draw(self):
+        if self.blit and self.background is not None:
+            self.canvas.restore_region(self.background)
+            self._DrawArtists()
+            self.canvas.blit(self.ax.figure.bbox)
+        else:
+            self.canvas.draw_idle()
+
+    # 次のフレームまで待つ（前回から interval 秒）
+    def wait(self, interval):
+        now = time.perf_counter()
+        if self.start is None:
+            self.start = now
+            self.last = now
+        self.interval = interval
+
+        remaining = interval - (now - self.last)
+        if remaining < 0:
+            self.late += 1      # 更新が間に合っていない
+        self.canvas.start_event_loop(max(remaining, 1e-3))
+        self.last = time.perf_counter()
+        self.frames += 1
+
+    # 実際の表示速度[fps]
+    def AchievedFPS(self):
+        if self.frames == 0 or self.last == self.start:
+            return 0.0
+        return self.frames / (self.last - self.start)
+
+    # 指定した表示速度[fps]
+    def RequestedFPS(self):
+        return 1.0 / self.interval if self.interval else 0.0
+
+    # 表示速度の報告
+    def report(self):
+        return 'achieved {:.1f} fps / requested {:.1f} fps ({} of {} frames late, blit={})'.format(
+            self.AchievedFPS(), self.RequestedFPS(), self.late, self.frames, self.blit)
+
+
+# たくさんの紙飛行機の表示（PaperAirplaneFleet）
+# 全機の面を1つのPoly3DCollectionにまとめ、フレームごとに座標だけ更新する
+# ax=3Dのaxes, fleet=Fleet, blit=PlaneView参照
+class FleetView(PlaneView):
+    def __init__(self, ax, fleet, blit=False):
+        self._Setup(ax, blit)
+
+        # グラフのエリア設定（全機が入る範囲）
+        lo = fleet.offsets.min(axis=0) - 1.5
+        hi = fleet.offsets.max(axis=0) + 1.5
+        c = (lo + hi) / 2.0
+        r = (hi - lo).max() / 2.0
+        ax.cla()
+        ax.set_xlabel("x");     ax.set_ylabel("y");     ax.set_zlabel("z")
+        ax.set_xlim(c[0]-r, c[0]+r);    ax.set_ylim(c[1]-r, c[1]+r);    ax.set_zlim(c[2]-r, c[2]+r)
+        ax.set_box_aspect((1,1,1))
+
+        # 各機の2枚の面を交互の色で1つのコレクションにする
+        colors = np.tile([[0.0, 0.0, 1.0, 0.5], [0.1, 0.1, 0.44, 0.5]], (len(fleet), 1))
+        self.polys = art3d.Poly3DCollection(fleet.polygons(), facecolors=colors, edgecolors='none')
+        ax.add_collection3d(self.polys)
+        self._Animate([self.polys])
+
+    # 全機の面[2N,4,3]に更新
+    def update(self, polygons):
+        self.polys.set_verts(polygons)
+
+
+# ディスプレイを使わないFigureを作成
+# size=(幅,高さ) ピクセル, dpi=解像度
+def HeadlessFigure(size=(800,600), dpi=100):
+    fig = Figure(figsize=(size[0]/dpi, size[1]/dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(111, projection='3d')
+    return fig, ax
+
+
+# 連番PNGのファイル名  'out.png' -> 'out_%04d.png'（%を含むときはそのまま）
+def FramePattern(path):
+    if '%' in path:
+        return path
+    root, ext = os.path.splitext(path)
+    return root + '_%04d' + ext
+
+
+# 並列書き出しのワーカー  プロセスごとにFigureとPlaneViewを1回だけ作る
+_worker = None
+
+def _InitWorker(clip, size, dpi):
+    global _worker
+    fig, ax = HeadlessFigure(size, dpi)
+    _worker = (fig, PlaneView(ax, clip))
+
+
+# フレーム start～stop-1 を描画
+# pattern=連番PNGのファイル名（Noneなら画像を返す）
+# return (画像[H,W,4]のリスト, フレームごとの (update, draw) 秒)
+def _RenderRange(start, stop, pattern, dpi):
+    fig, view = _worker
+    images = []
+    times = []
+    for f in range(start, stop):
+        t0 = time.perf_counter()
+        view.update(f)
+        t1 = time.perf_counter()
+        if pattern is None:
+            fig.canvas.draw()
+            images.append(np.array(fig.canvas.buffer_rgba()))
+        else:
+            fig.savefig(pattern % f, dpi=dpi)
+        times.append((t1 - t0, time.perf_counter() - t1))
+    return images, times
+
+
+# フレームを chunk 個ずつ複数プロセスで描画し、フレーム順に返す
+# 同時に描画中にするのは workers*2 個の範囲まで（メモリ使用量を抑える）
+# yield (フレーム番号, 画像（連番PNGのときはNone）, update秒, draw秒)
+def _RenderParallel(clip, pattern, size, dpi, workers, chunk):
+    frames = len(clip.model)
+    ranges = iter([(s, min(s + chunk, frames)) for s in range(0, frames, chunk)])
+    with ProcessPoolExecutor(workers, initializer=_InitWorker, initargs=(clip, size, dpi)) as pool:
+        pending = deque()
+
+        def submit():
+            r = next(ranges, None)
+            if r is not None:
+                pending.append((r[0], pool.submit(_RenderRange, r[0], r[1], pattern, dpi)))
+
+        for _ in range(workers * 2):
+            submit()
+        while pending:
+            start, future = pending.popleft()
+            images, times = future.result()
+            submit()
+            for i, (tu, td) in enumerate(times):
+                yield start + i, images[i] if images else None, tu, td
+
+
+# 描画済みの画像[H,W,4]をffmpegに直接送って動画にする（Figureを描き直さない）
+class _VideoSink:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.proc = None
+
+    def write(self, rgba):
+        if self.proc is None:
+            h, w = rgba.shape[:2]
+            args = [animation.FFMpegWriter.bin_path(), '-f', 'rawvideo', '-vcodec', 'rawvideo',
+                    '-s', '%dx%d' % (w, h), '-pix_fmt', 'rgba', '-framerate', str(self.fps),
+                    '-loglevel', 'error', '-i', 'pipe:',
+                    '-vcodec', matplotlib.rcParams['animation.codec'], '-pix_fmt', 'yuv420p', '-y', self.path]
+            self.proc = subprocess.Popen(args, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self.proc.stdin.write(np.ascontiguousarray(rgba).tobytes())
+
+    def close(self):
+        if self.proc is None:
+            return
+        self.proc.stdin.close()
+        err = self.proc.stderr.read()
+        if self.proc.wait() != 0:
+            raise RuntimeError('ffmpeg failed: ' + err.decode(errors='replace'))
+
+
+# 描画済みの画像[H,W,4]をGIFにする（PillowWriterと同じ保存方法）
+class _GifSink:
+    def __init__(self, path, fps):
+        self.path = path
+        self.fps = fps
+        self.frames = []
+
+    def write(self, rgba):
+        from PIL import Image
+
+        im = Image.fromarray(np.ascontiguousarray(rgba), 'RGBA')
+        self.frames.append(im if im.getextrema()[3][0] < 255 else im.convert('RGB'))
+
+    def close(self):
+        if self.frames:
+            self.frames[0].save(self.path, save_all=True, append_images=self.frames[1:],
+                                duration=int(1000 / self.fps), loop=0)
+
+
+# Clipを動画または連番PNGに書き出し
+# clip=Clip,
+# path=書き出し先  .mp4（ffmpegが必要） / .gif / .png（連番、'frame_%04d.png' の形式も可）,
+# fps=1秒あたりのフレーム数,
+# size=(幅,高さ) ピクセル, dpi=解像度,
+# profiler=FrameProfiler（フレームごとの update / draw の時間を記録する）,
+# workers=描画するプロセス数（1なら並列にしない、None/0ならCPU数）,
+# chunk=1回にワーカーに渡すフレーム数（Noneなら 16 とフレーム数/workers の小さい方）
+# return 書き出したフレーム数
+def ExportClip(clip, path, fps=10, size=(800,600), dpi=100, profiler=None, workers=1, chunk=None):
+    prof = profiler or NULL_PROFILER
+    frames = len(clip.model)
+    ext = os.path.splitext(path)[1].lower()
+    workers = workers or os.cpu_count() or 1
+    if chunk is None:
+        chunk = max(1, min(16, -(-frames // workers)))
+
+    if ext == '.gif':
+        writer = animation.PillowWriter(fps=fps)
+    elif ext in ('.mp4', '.mov', '.mkv', '.avi'):
+        if not animation.writers.is_available('ffmpeg'):
+            raise RuntimeError('ffmpeg is required to write ' + ext)
+        writer = animation.FFMpegWriter(fps=fps)
+    elif ext != '.png':
+        raise ValueError('unsupported export format: ' + path)
+
+    if workers > 1:
+        prof.note('workers', workers)
+        if ext == '.png':
+            for f, _, tu, td in _RenderParallel(clip, FramePattern(path), size, dpi, workers, chunk):
+                prof.start()
+                prof.add('update', tu)
+                prof.add('draw', td)
+                prof.end()
+            return frames
+
+        # ワーカーが描画した画像をそのまま順に書き出す
+        sink = _GifSink(path, fps) if ext == '.gif' else _VideoSink(path, fps)
+        try:
+            for f, rgba, tu, td in _RenderParallel(clip, None, size, dpi, workers, chunk):
+                prof.start()
+                prof.add('update', tu)
+                prof.add('draw', td)
+                sink.write(rgba)
+                prof.lap('write')
+                prof.end()
+        finally:
+            sink.close()
+        return frames
+
+    fig, ax = HeadlessFigure(size, dpi)
+    view = PlaneView(ax, clip)
+    if ext == '.png':
+        pattern = FramePattern(path)
+        for f in range(frames):
+            prof.start()
+            view.update(f)
+            prof.lap('update')
+            fig.savefig(pattern % f, dpi=dpi)
+            prof.lap('draw')
+            prof.end()
+        return frames
+
+    with writer.saving(fig, path, dpi):
+        for f in range(frames):
+            prof.start()
+            view.update(f)
+            prof.lap('update')
+            writer.grab_frame()
+            prof.lap('draw')
+            prof.end()
+    return frames
@@ -0,0 +1,914 @@
+"""
+3次元の回転（オイラー角・回転行列・クオータニオン）
+
+紙飛行機のデモ (PaperAirplaneEuler / PaperAirplaneQuaternion) などで共通に使う計算部分
+インポート時に読み込むのはNumPyだけです（matplotlib・numpy-quaternionは読み込みません）
+
+参考URL
+回転行列、クォータニオン(四元数)、オイラー角の相互変換
+ https://qiita.com/aa_debdeb/items/3d02e28fb9ebfa357eaf
+
+"""
+
+import functools
+from enum import Enum
+from typing import NamedTuple
+
+import numpy as np
+
+
+# オイラー角の回転順
+class EulerOrder(Enum):
+    XYZ=0
+    XZY=1
+    YXZ=2
+    YZX=3
+    ZXY=4
+    ZYX=5
+
+# 紙飛行機のmodelデータを作成
+def plane(offset):
+    x = [1,-1,-1, 1,-1,-1, 1]
+    y = [0, 1,-1, 0, 0, 0, 0]
+    z = [0, 0, 0, 0,-0.5, 0, 0]
+
+    mx, my, mz = np.array([x, y, z], dtype=float) + np.asarray(offset, dtype=float)[:, None]
+
+    return mx, my, mz
+
+
+# 回転軸の作成（表示用）
+def axis(offset):
+    # 軸成分のデータの作成
+    x = [1, 0, 0]
+    y = [0, 1, 0]
+    z = [0, 0, 1]
+
+    mx, my, mz = np.array([x, y, z], dtype=float) + np.asarray(offset, dtype=float)[:, None]
+
+    return mx, my, mz
+
+
+# オイラー角で回転
+# p[3]=回転前座標,
+# th[3]=オイラー角（ラジアンXYZ）,
+# order=回転順
+# return x,y,z 回転後座標
+def EulerAngles(p, th, order):
+    if order == EulerOrder.XYZ:
+        #XYZ
+        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[1])*np.sin(th[2]))*p[1]) + (np.sin(th[1])*p[2])
+        y = ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])+np.cos(th[0])*np.sin(th[2]))*p[0]) + ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[1]))*p[2])
+        z = ((-np.cos(th[0])*np.sin(th[1])*np.cos(th[2])+np.sin(th[0])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])+np.sin(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
+    elif order == EulerOrder.XZY:
+        #XZY
+        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + (-np.sin(th[2])*p[1]) + ((np.sin(th[1])*np.cos(th[2]))*p[2])
+        y = ((np.cos(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[0])*np.sin(th[1]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])-np.sin(th[0])*np.cos(th[1]))*p[2])
+        z = ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])-np.cos(th[0])*np.sin(th[1]))*p[0]) + ((np.sin(th[0])*np.cos(th[2]))*p[1]) + ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[1]))*p[2])
+    elif order == EulerOrder.YXZ:
+        #YXZ
+        x = ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])-np.cos(th[1])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1]))*p[2])
+        y = ((np.cos(th[0])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0]))*p[2])
+        z = ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])-np.sin(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.cos(th[1])*np.cos(th[2])+np.sin(th[1])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
+    elif order == EulerOrder.YZX:
+        #YZX
+        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[0])*np.sin(th[1]))*p[1]) + ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])+np.cos(th[0])*np.sin(th[1]))*p[2])
+        y = ((np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[2]))*p[2])
+        z = ((-np.sin(th[1])*np.cos(th[2]))*p[0]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])+np.sin(th[0])*np.cos(th[1]))*p[1]) + ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[1]))*p[2])
+    elif order == EulerOrder.ZXY:
+        #ZXY
+        x = ((-np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[1])*np.cos(th[2]))*p[0]) + ((-np.cos(th[0])*np.sin(th[2]))*p[1]) + ((np.sin(th[0])*np.cos(th[1])*np.sin(th[2])+np.sin(th[1])*np.cos(th[2]))*p[2])
+        y = ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])+np.cos(th[1])*np.sin(th[2]))*p[0]) + ((np.cos(th[0])*np.cos(th[2]))*p[1]) + ((-np.sin(th[0])*np.cos(th[1])*np.cos(th[2])+np.sin(th[1])*np.sin(th[2]))*p[2])
+        z = ((-np.cos(th[0])*np.sin(th[1]))*p[0]) + ((np.sin(th[0]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
+    elif order == EulerOrder.ZYX:
+        #ZYX
+        x = ((np.cos(th[1])*np.cos(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.cos(th[2])-np.cos(th[0])*np.sin(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.cos(th[2])+np.sin(th[0])*np.sin(th[2]))*p[2])
+        y = ((np.cos(th[1])*np.sin(th[2]))*p[0]) + ((np.sin(th[0])*np.sin(th[1])*np.sin(th[2])+np.cos(th[0])*np.cos(th[2]))*p[1]) + ((np.cos(th[0])*np.sin(th[1])*np.sin(th[2])-np.sin(th[0])*np.cos(th[2]))*p[2])
+        z = ((-np.sin(th[1]))*p[0]) + ((np.sin(th[0])*np.cos(th[1]))*p[1]) + ((np.cos(th[0])*np.cos(th[1]))*p[2])
+
+    return x,y,z
+
+# オイラー角(th)から回転行列を作成
+# th[3] または th[M,3]=オイラー角（ラジアンXYZ）,
+# order=回転順
+# return R[M,3,3] 回転行列（sin/cosは姿勢ごとに1回だけ計算）
+def EulerMatrix(th, order):
+    th = np.atleast_2d(np.asarray(th, dtype=float))
+    s0, s1, s2 = np.sin(th).T
+    c0, c1, c2 = np.cos(th).T
+
+    R = np.empty((th.shape[0], 3, 3))
+    if order == EulerOrder.XYZ:
+        R[:,0,0] = c1*c2;             R[:,0,1] = -c1*s2;            R[:,0,2] = s1
+        R[:,1,0] = s0*s1*c2 + c0*s2;  R[:,1,1] = -s0*s1*s2 + c0*c2; R[:,1,2] = -s0*c1
+        R[:,2,0] = -c0*s1*c2 + s0*s2; R[:,2,1] = c0*s1*s2 + s0*c2;  R[:,2,2] = c0*c1
+    elif order == EulerOrder.XZY:
+        R[:,0,0] = c1*c2;             R[:,0,1] = -s2;               R[:,0,2] = s1*c2
+        R[:,1,0] = c0*c1*s2 + s0*s1;  R[:,1,1] = c0*c2;             R[:,1,2] = c0*s1*s2 - s0*c1
+        R[:,2,0] = s0*c1*s2 - c0*s1;  R[:,2,1] = s0*c2;             R[:,2,2] = s0*s1*s2 + c0*c1
+    elif order == EulerOrder.YXZ:
+        R[:,0,0] = s0*s1*s2 + c1*c2;  R[:,0,1] = s0*s1*c2 - c1*s2;  R[:,0,2] = c0*s1
+        R[:,1,0] = c0*s2;             R[:,1,1] = c0*c2;             R[:,1,2] = -s0
+        R[:,2,0] = s0*c1*s2 - s1*c2;  R[:,2,1] = s0*c1*c2 + s1*s2;  R[:,2,2] = c0*c1
+    elif order == EulerOrder.YZX:
+        R[:,0,0] = c1*c2;             R[:,0,1] = -c0*c1*s2 + s0*s1; R[:,0,2] = s0*c1*s2 + c0*s1
+        R[:,1,0] = s2;                R[:,1,1] = c0*c2;             R[:,1,2] = -s0*c2
+        R[:,2,0] = -s1*c2;            R[:,2,1] = c0*s1*s2 + s0*c1;  R[:,2,2] = -s0*s1*s2 + c0*c1
+    elif order == EulerOrder.ZXY:
+        R[:,0,0] = -s0*s1*s2 + c1*c2; R[:,0,1] = -c0*s2;            R[:,0,2] = s0*c1*s2 + s1*c2
+        R[:,1,0] = s0*s1*c2 + c1*s2;  R[:,1,1] = c0*c2;             R[:,1,2] = -s0*c1*c2 + s1*s2
+        R[:,2,0] = -c0*s1;            R[:,2,1] = s0;                R[:,2,2] = c0*c1
+    elif order == EulerOrder.ZYX:
+        R[:,0,0] = c1*c2;             R[:,0,1] = s0*s1*c2 - c0*s2;  R[:,0,2] = c0*s1*c2 + s0*s2
+        R[:,1,0] = c1*s2;             R[:,1,1] = s0*s1*s2 + c0*c2;  R[:,1,2] = c0*s1*s2 - s0*c2
+        R[:,2,0] = -s1;               R[:,2,1] = s0*c1;             R[:,2,2] = c0*c1
+    else:
+        raise ValueError('unknown EulerOrder: ' + str(order))
+
+    return R
+
+# 点群(points)をオイラー角(th)でまとめて回転
+# points[N,3]=回転前座標,
+# th[3] または th[M,3]=オイラー角（ラジアンXYZ）,
+# order=回転順
+# return P[M,N,3] 姿勢ごとの回転後座標
+def EulerAnglesBatch(points, th, order):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+    R = EulerMatrix(th, order)
+    return np.matmul(points, R.transpose(0, 2, 1))
+
+# オイラー角をQuaternionに変換
+# th[3]=オイラー角（ラジアンXYZ）,
+# order=回転順
+# return q クオータニオン
+def Euler2Quaternion(th, order):
+    if order == EulerOrder.XYZ:
+        x = np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+        y = -np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        z = np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) + np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        w = -np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+    elif order == EulerOrder.XZY:
+        x = -np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+        y = np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) - np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        z = np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        w = np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+    elif order == EulerOrder.YXZ:
+        x = np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+        y = -np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        z = np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) - np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        w = np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+    elif order == EulerOrder.YZX:
+        x = np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0) + np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0)
+        y = np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        z = -np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        w = -np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+    elif order == EulerOrder.ZXY:
+        x = -np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+        y = np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) + np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        z = np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        w = -np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+    elif order == EulerOrder.ZYX:
+        x = np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0) - np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0)
+        y = np.sin(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0)
+        z = -np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.cos(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.sin(th[2]/2.0)
+        w = np.sin(th[0]/2.0)*np.sin(th[1]/2.0)*np.sin(th[2]/2.0) + np.cos(th[0]/2.0)*np.cos(th[1]/2.0)*np.cos(th[2]/2.0)
+
+    import quaternion       # numpy-quaternion は使うときに読み込む
+    q = np.quaternion(w,x,y,z)
+    return q
+
+# オイラー角の配列をまとめてQuaternionに変換
+# th[3] または th[N,3]=オイラー角（ラジアンXYZ）,
+# order=回転順
+# return q[N,4] クオータニオン (w,x,y,z)
+def Euler2QuaternionArray(th, order):
+    th = np.atleast_2d(np.asarray(th, dtype=float)) / 2.0
+    s0, s1, s2 = np.sin(th).T
+    c0, c1, c2 = np.cos(th).T
+
+    q = np.empty((th.shape[0], 4))
+    if order == EulerOrder.XYZ:
+        q[:,1] = c0*s1*s2 + s0*c1*c2
+        q[:,2] = -s0*c1*s2 + c0*s1*c2
+        q[:,3] = c0*c1*s2 + s0*s1*c2
+        q[:,0] = -s0*s1*s2 + c0*c1*c2
+    elif order == EulerOrder.XZY:
+        q[:,1] = -c0*s1*s2 + s0*c1*c2
+        q[:,2] = c0*s1*c2 - s0*c1*s2
+        q[:,3] = s0*s1*c2 + c0*c1*s2
+        q[:,0] = s0*s1*s2 + c0*c1*c2
+    elif order == EulerOrder.YXZ:
+        q[:,1] = c0*s1*s2 + s0*c1*c2
+        q[:,2] = -s0*c1*s2 + c0*s1*c2
+        q[:,3] = c0*c1*s2 - s0*s1*c2
+        q[:,0] = s0*s1*s2 + c0*c1*c2
+    elif order == EulerOrder.YZX:
+        q[:,1] = s0*c1*c2 + c0*s1*s2
+        q[:,2] = s0*c1*s2 + c0*s1*c2
+        q[:,3] = -s0*s1*c2 + c0*c1*s2
+        q[:,0] = -s0*s1*s2 + c0*c1*c2
+    elif order == EulerOrder.ZXY:
+        q[:,1] = -c0*s1*s2 + s0*c1*c2
+        q[:,2] = c0*s1*c2 + s0*c1*s2
+        q[:,3] = s0*s1*c2 + c0*c1*s2
+        q[:,0] = -s0*s1*s2 + c0*c1*c2
+    elif order == EulerOrder.ZYX:
+        q[:,1] = s0*c1*c2 - c0*s1*s2
+        q[:,2] = s0*c1*s2 + c0*s1*c2
+        q[:,3] = -s0*s1*c2 + c0*c1*s2
+        q[:,0] = s0*s1*s2 + c0*c1*c2
+    else:
+        raise ValueError('unknown EulerOrder: ' + str(order))
+
+    return q
+
+# クオータニオン配列の積（ハミルトン積） q1 * q2
+# q1[...,4], q2[...,4]=クオータニオン (w,x,y,z)  先頭の次元はブロードキャスト
+# return q[...,4]
+def QuaternionMultiply(q1, q2):
+    q1 = np.asarray(q1, dtype=float)
+    q2 = np.asarray(q2, dtype=float)
+    w1, x1, y1, z1 = np.moveaxis(q1, -1, 0)
+    w2, x2, y2, z2 = np.moveaxis(q2, -1, 0)
+
+    return np.stack([w1*w2 - x1*x2 - y1*y2 - z1*z2,
+                     w1*x2 + x1*w2 + y1*z2 - z1*y2,
+                     w1*y2 - x1*z2 + y1*w2 + z1*x2,
+                     w1*z2 + x1*y2 - y1*x2 + z1*w2], axis=-1)
+
+# クオータニオン配列の共役
+# q[...,4]=クオータニオン (w,x,y,z)
+# return q[...,4]
+def QuaternionConj(q):
+    q = np.array(q, dtype=float)
+    q[...,1:] *= -1.0
+    return q
+
+# クオータニオンを回転行列に変換
+# q[4] または q[M,4]=クオータニオン (w,x,y,z)
+# return R[M,3,3]  q * p * q.conj() と同じ変換（qが単位クオータニオンでなくてもよい）
+def Quaternion2Matrix(q):
+    q = np.atleast_2d(np.asarray(q, dtype=float))
+    w, x, y, z = q.T
+
+    R = np.empty((q.shape[0], 3, 3))
+    R[:,0,0] = w*w + x*x - y*y - z*z; R[:,0,1] = 2.0*(x*y - w*z);       R[:,0,2] = 2.0*(x*z + w*y)
+    R[:,1,0] = 2.0*(x*y + w*z);       R[:,1,1] = w*w - x*x + y*y - z*z; R[:,1,2] = 2.0*(y*z - w*x)
+    R[:,2,0] = 2.0*(x*z - w*y);       R[:,2,1] = 2.0*(y*z + w*x);       R[:,2,2] = w*w - x*x - y*y + z*z
+
+    return R
+
+# 点群(points)をクオータニオン(q)でまとめて回転  q * p * q.conj()
+# q[4] または q[M,4]=クオータニオン (w,x,y,z),
+# points[N,3]=回転前座標
+# return P[M,N,3] 姿勢ごとの回転後座標
+def QuaternionRotate(q, points):
+    points = np.asarray(points, dtype=float).reshape(-1, 3)
+
+    # q * p * q.conj() を3x3行列にまとめる（点ごとの積の計算を行列積1回にする）
+    R = Quaternion2Matrix(q)
+    return np.matmul(points, R.transpose(0, 2, 1))
+
+
+# 回転行列をクオータニオンに変換（Shepperdの方法  対角成分の大きい式を選んで桁落ちを避ける）
+# R[3,3] または R[N,3,3]=回転行列
+# return q[N,4] 単位クオータニオン (w,x,y,z)  w>=0
+def Matrix2Quaternion(R):
+    R = np.asarray(R, dtype=float).reshape(-1, 3, 3)
+    r00, r11, r22 = R[:,0,0], R[:,1,1], R[:,2,2]
+    a = R[:,2,1] - R[:,1,2]     # 4wx
+    b = R[:,0,2] - R[:,2,0]     # 4wy
+    c = R[:,1,0] - R[:,0,1]     # 4wz
+    d = R[:,0,1] + R[:,1,0]     # 4xy
+    e = R[:,0,2] + R[:,2,0]     # 4xz
+    f = R[:,1,2] + R[:,2,1]     # 4yz
+
+    # 4w^2, 4x^2, 4y^2, 4z^2 に当たる値の最も大きいものを使う
+    diag = np.stack([1.0 + r00 + r11 + r22,
+                     1.0 + r00 - r11 - r22,
+                     1.0 - r00 + r11 - r22,
+                     1.0 - r00 - r11 + r22], axis=1)
+    k = np.argmax(diag, axis=1)
+    cand = np.stack([np.stack([diag[:,0], a, b, c], axis=1),
+                     np.stack([a, diag[:,1], d, e], axis=1),
+                     np.stack([b, d, diag[:,2], f], axis=1),
+                     np.stack([c, e, f, diag[:,3]], axis=1)], axis=1)
+    q = cand[np.arange(len(R)), k]
+    q /= np.linalg.norm(q, axis=1, keepdims=True)
+    q[q[:,0] < 0] *= -1.0
+    return q
+
+# 回転行列をオイラー角に変換
+# R[3,3] または R[N,3,3]=回転行列,
+# order=回転順
+# return th[N,3] オイラー角（ラジアンXYZ）  EulerMatrix(th, order) が R になる
+# 中央の軸が±90度（ジンバルロック）のときは最後の軸の角度を0にする
+def Matrix2Euler(R, order):
+    R = np.asarray(R, dtype=float).reshape(-1, 3, 3)
+    i, j, k = OrderAxes(order)
+    sign = 1.0 if (i, j, k) in ((0,1,2), (1,2,0), (2,0,1)) else -1.0     # 偶置換なら+1
+
+    # R = R_i(th_i) R_j(th_j) R_k(th_k)
+    sj = sign * R[:,i,k]
+    cj = np.hypot(R[:,i,i], R[:,i,j])
+    lock = cj < 1e-9
+
+    th = np.empty((len(R), 3))
+    th[:,j] = np.arctan2(sj, cj)
+    th[:,i] = np.where(lock, np.arctan2(sign * R[:,k,j], R[:,j,j]), np.arctan2(-sign * R[:,j,k], R[:,k,k]))
+    th[:,k] = np.where(lock, 0.0, np.arctan2(-sign * R[:,i,j], R[:,i,i]))
+    return th
+
+# クオータニオンをオイラー角に変換
+# q[4] または q[N,4]=クオータニオン (w,x,y,z)（単位でなくてもよい）,
+# order=回転順
+# return th[N,3] オイラー角（ラジアンXYZ）  Matrix2Euler参照
+def Quaternion2Euler(q, order):
+    q = np.atleast_2d(np.asarray(q, dtype=float))
+    return Matrix2Euler(Quaternion2Matrix(q / np.linalg.norm(q, axis=1, keepdims=True)), order)
+
+# クオータニオンを回転軸と回転角に変換
+# q[4] または q[N,4]=クオータニオン (w,x,y,z)（単位でなくてもよい）
+# return axis[N,3] 単位ベクトル（回転しない姿勢は0ベクトル）, angle[N] 回転角（ラジアン 0～π）
+def Quaternion2AxisAngle(q):
+    q = np.atleast_2d(np.asarray(q, dtype=float))
+    q = np.where(q[:,:1] < 0, -q, q)        # q と -q は同じ回転  w>=0 にして0～πにする
+    v = q[:,1:]
+    n = np.linalg.norm(v, axis=1)
+    angle = 2.0 * np.arctan2(n, q[:,0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        axis = np.where(n[:,None] > 0, v / n[:,None], 0.0)
+    return axis, angle
+
+# 回転軸と回転角をクオータニオンに変換
+# axis[3] または axis[N,3]=回転軸（単位ベクトルでなくてもよい）,
+# angle または angle[N]=回転角（ラジアン）  axis と angle の一方が1つなら他方の数にそろえる
+# return q[N,4] 単位クオータニオン (w,x,y,z)
+def AxisAngle2Quaternion(axis, angle):
+    axis = np.atleast_2d(np.asarray(axis, dtype=float))
+    angle = np.asarray(angle, dtype=float).reshape(-1)
+    n = np.linalg.norm(axis, axis=1, keepdims=True)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.where(n > 0, axis / n, 0.0)
+    u, h = np.broadcast_arrays(u, angle[:,None] / 2.0)     # 軸1つと角度N個、軸N個と角度1つも可
+    return np.concatenate([np.cos(h[:,:1]), np.sin(h[:,:1]) * u], axis=1)
+
+
+# 回転ベクトルをクオータニオンに変換（指数写像  q = exp(v/2)）
+# v[3] または v[N,3]=回転ベクトル（向き=回転軸, 長さ=回転角 ラジアン）
+# return q[N,4] 単位クオータニオン (w,x,y,z)
+def RotationVector2Quaternion(v):
+    v = np.atleast_2d(np.asarray(v, dtype=float))
+    a = np.linalg.norm(v, axis=1)
+    h = a / 2.0
+    # sin(a/2)/a  小さい角度はテイラー展開（0で割らない）
+    small = a < 1e-4
+    with np.errstate(divide='ignore', invalid='ignore'):
+        k = np.where(small, 0.5 - a*a / 48.0, np.sin(h) / a)
+    return np.concatenate([np.cos(h)[:,None], k[:,None] * v], axis=1)
+
+# クオータニオン配列の累積積  P[i] = q[0] * q[1] * ... * q[i]
+# q[N,4]=クオータニオン (w,x,y,z),
+# block=まとめて計算する区間の長さ
+# return P[N,4]
+# block個ずつの区間の中で倍々に区間をつなぎ（log2(block)回の配列計算）、区間の先頭までの積を掛ける
+# 途中で毎回正規化して誤差がたまらないようにする
+def QuaternionCumprod(q, block=64):
+    q = np.asarray(q, dtype=float).reshape(-1, 4)
+    n = len(q)
+    nb = -(-n // block)
+    P = np.zeros((nb * block, 4))
+    P[:, 0] = 1.0               # 余りは回転なしで埋める
+    P[:n] = q
+    P = P.reshape(nb, block, 4)
+
+    shift = 1
+    while shift < block:
+        P[:, shift:] = QuaternionMultiply(P[:, :-shift], P[:, shift:])
+        P /= np.linalg.norm(P, axis=2, keepdims=True)
+        shift *= 2
+
+    if nb > 1:
+        head = QuaternionCumprod(P[:-1, -1], block)     # 各区間の先頭までの積
+        P[1:] = QuaternionMultiply(head[:, None, :], P[1:])
+        P[1:] /= np.linalg.norm(P[1:], axis=2, keepdims=True)
+    return P.reshape(-1, 4)[:n]
+
+# 角速度（ジャイロ）を積分してクオータニオンの姿勢にする
+# 前回の姿勢・時刻・角速度を持っているので、長い記録を区切って順に update できる
+# q0[4]=初期姿勢 (w,x,y,z)（省略時は回転なし）,
+# frame='body'（機体座標の角速度  q * dq） / 'world'（空間座標の角速度  dq * q）
+class AttitudeIntegrator:
+    def __init__(self, q0=None, frame='body'):
+        if frame not in ('body', 'world'):
+            raise ValueError('unknown frame: ' + str(frame))
+        self.frame = frame
+        self.q = np.array([1.0, 0.0, 0.0, 0.0]) if q0 is None else np.asarray(q0, dtype=float) / np.linalg.norm(q0)
+        self.t = None           # 前回の最後の時刻
+        self.rate = None        # 前回の最後の角速度
+        self.samples = 0
+
+    # rates[N,3]=角速度（ラジアン/秒）, times[N]=時刻（秒）
+    # return q[N,4] 各サンプルの時刻の姿勢
+    # サンプル間は前後の角速度の平均で一定に回転したとする（最初のサンプルは初期姿勢）
+    def update(self, rates, times):
+        w = np.asarray(rates, dtype=float).reshape(-1, 3)
+        t = np.asarray(times, dtype=float).reshape(-1)
+        if len(t) != len(w):
+            raise ValueError('rates and times must have the same length')
+        if len(t) == 0:
+            return np.empty((0, 4))
+
+        t_prev = t[:1] if self.t is None else np.array([self.t])
+        w_prev = w[:1] if self.rate is None else self.rate[None, :]
+        dt = np.diff(np.concatenate([t_prev, t]))
+        if np.any(dt < 0):
+            raise ValueError('times must not decrease')
+        wm = (np.concatenate([w_prev, w[:-1]]) + w) / 2.0
+
+        dq = RotationVector2Quaternion(wm * dt[:, None])
+        if self.frame == 'body':
+            q = QuaternionMultiply(self.q, QuaternionCumprod(dq))
+        else:
+            # dq[i] * ... * dq[0] = conj(conj(dq[0]) * ... * conj(dq[i]))
+            q = QuaternionMultiply(QuaternionConj(QuaternionCumprod(QuaternionConj(dq))), self.q)
+        q /= np.linalg.norm(q, axis=1, keepdims=True)
+
+        self.q = q[-1].copy()
+        self.t = t[-1]
+        self.rate = w[-1].copy()
+        self.samples += len(t)
+        return q
+
+# 角速度をまとめて積分
+# rates[N,3]=角速度（ラジアン/秒）, times[N]=時刻（秒）, q0, frame=AttitudeIntegrator参照
+# return q[N,4] 各サンプルの時刻の姿勢
+def IntegrateRates(rates, times, q0=None, frame='body'):
+    return AttitudeIntegrator(q0, frame).update(rates, times)
+
+
+# 球面線形補間 (slerp)
+# q0[4], q1[4]=開始・終了クオータニオン (w,x,y,z),
+# t[F]=補間位置 0.0～1.0
+# return q[F,4] 補間したクオータニオン（最短経路）
+def QuaternionSlerp(q0, q1, t):
+    q0 = np.asarray(q0, dtype=float)
+    q1 = np.asarray(q1, dtype=float)
+    t = np.atleast_1d(np.asarray(t, dtype=float))[:, None]
+
+    d = np.dot(q0, q1)
+    if d < 0.0:         # q と -q は同じ回転なので近い方を通る
+        q1 = -q1
+        d = -d
+
+    if d > 0.9995:      # ほぼ同じ姿勢は線形補間で十分
+        q = q0 + t * (q1 - q0)
+        return q / np.linalg.norm(q, axis=1, keepdims=True)
+
+    omega = np.arccos(d)
+    return (np.sin((1.0 - t) * omega) * q0 + np.sin(t * omega) * q1) / np.sin(omega)
+
+# 補間位置の作成
+# frames=フレーム数（2以上）,
+# profile='linear' / 'ease-in' / 'ease-out' / 'ease-in-out'
+#         または角速度の配列[frames-1]（フレーム間の回転量の比）
+# return t[F] 0.0～1.0
+def SlerpProfile(frames, profile='linear'):
+    if not isinstance(profile, str):
+        w = np.asarray(profile, dtype=float)
+        if w.ndim != 1 or np.any(w < 0) or w.sum() <= 0:
+            raise ValueError('angular velocity profile must be a non-negative 1-D array')
+        t = np.concatenate([[0.0], np.cumsum(w)])
+        return t / t[-1]
+
+    if frames < 2:
+        raise ValueError('frames must be 2 or more')
+    t = np.linspace(0.0, 1.0, frames)
+    if profile == 'linear':
+        return t
+    elif profile == 'ease-in':
+        return t * t
+    elif profile == 'ease-out':
+        return 1.0 - (1.0 - t) ** 2
+    elif profile == 'ease-in-out':
+        return t * t * (3.0 - 2.0 * t)
+    raise ValueError('unknown profile: ' + str(profile))
+
+# 開始姿勢から目標姿勢までのslerp軌道を作成
+# q0[4], q1[4]=開始・目標クオータニオン (w,x,y,z),
+# frames=フレーム数  Noneのときは1フレームあたりspeed[度]で回転するフレーム数,
+# profile=SlerpProfile参照
+# return q[F,4] 各フレームの姿勢
+def SlerpTrajectory(q0, q1, frames=None, profile='linear', speed=5.0):
+    if frames is None and isinstance(profile, str):
+        d = abs(np.dot(q0, q1)) / (np.linalg.norm(q0) * np.linalg.norm(q1))
+        rotate = 2.0 * np.arccos(min(d, 1.0)) * 180.0 / np.pi
+        frames = max(int(np.ceil(rotate / speed)) + 1, 2)
+
+    return QuaternionSlerp(q0, q1, SlerpProfile(frames, profile))
+
+@functools.lru_cache(maxsize=32)
+def _PlaneTrajectory(angle, start, order, frames, profile, speed):
+    P = np.column_stack(plane([0,0,0]))
+    th = np.radians([start, angle])
+    q0, q1 = Euler2QuaternionArray(th, order)
+
+    Q = SlerpTrajectory(q0, q1, frames, profile, speed)
+    V = QuaternionRotate(Q, P)
+    Q.flags.writeable = False       # キャッシュを共有するので書き換え禁止
+    V.flags.writeable = False
+    return Q, V
+
+# 紙飛行機の回転軌道をまとめて計算
+# angle[3]=目標姿勢のオイラー角（度）,
+# order=回転順,
+# start[3]=開始姿勢のオイラー角（度）,
+# frames, profile, speed=SlerpTrajectory参照
+# cache=Falseなら毎回計算する（速度の計測用）
+# return Q[F,4] 各フレームの姿勢, V[F,7,3] 各フレームのモデル座標
+# 同じ引数の軌道はキャッシュして再利用する（配列は読み取り専用）
+def PlaneTrajectory(angle, order, start=(0.0, 0.0, 0.0), frames=None, profile='linear', speed=5.0, cache=True):
+    angle = tuple(float(a) for a in angle)
+    start = tuple(float(a) for a in start)
+    if cache and isinstance(profile, str):
+        return _PlaneTrajectory(angle, start, order, frames, profile, speed)
+    return _PlaneTrajectory.__wrapped__(angle, start, order, frames, profile, speed)
+
+
+# 回転行列・クオータニオンのキャッシュ（LRU）
+# オイラー角を resolution 単位に丸めた値と回転順をキーにして計算済みの姿勢を再利用する
+# 丸めた角度で計算するので、同じキーには常に同じ値を返す
+# 検索は配列のまま（ハッシュ表）で行い、姿勢ごとのループはない
+# maxsize=回転順ごとに保存する姿勢の数の上限（超えたら最も長く使っていない姿勢を捨てる）,
+# resolution=角度を丸める単位（ラジアン  4π/2^21 以上、3つの角度を1つの整数のキーにするため）
+class RotationCache:
+    _BITS = 21
+
+    def __init__(self, maxsize=4096, resolution=1e-5):
+        if maxsize <= 0:
+            raise ValueError('maxsize must be positive')
+        self.steps = int(np.ceil(4.0 * np.pi / resolution))     # 4π（クオータニオンの周期）あたりの刻みの数
+        if resolution <= 0 or self.steps > 1 << self._BITS:
+            raise ValueError("resolution must be at least 4*pi/2**21")
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self._tables = {}           # 回転順 -> _CacheTable
+        self._tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return sum(len(t.keys) for t in self._tables.values())
+
+    # th[M,3] -> キー[M]  各角度を 0～steps-1 に丸めて21ビットずつ並べる
+    def _Keys(self, th):
+        k = np.rint(np.atleast_2d(np.asarray(th, dtype=float)) / self.resolution).astype(np.int64) % self.steps
+        return (k[:, 0] << (2 * self._BITS)) | (k[:, 1] << self._BITS) | k[:, 2]
+
+    # キー[M] -> 丸めたオイラー角[M,3]
+    def _Angles(self, keys):
+        mask = (1 << self._BITS) - 1
+        k = np.stack([keys >> (2 * self._BITS), (keys >> self._BITS) & mask, keys & mask], axis=1)
+        return k * self.resolution
+
+    # return (R[S,3,3], q[S,4], 姿勢ごとの番号[M])  R[番号] が姿勢ごとの回転行列
+    def _Lookup(self, th, order):
+        table = self._tables.get(order)
+        if table is None:
+            table = self._tables[order] = _CacheTable(self.maxsize)
+        self._tick += 1
+        keys = self._Keys(th)
+
+        slots = table.find(keys)
+        miss = slots < 0
+        table.used[slots[~miss]] = self._tick       # 今回使う姿勢は捨てない
+        computed = 0
+        if miss.any():
+            new = np.unique(keys[miss])
+            if len(new) + len(np.unique(slots[~miss])) > self.maxsize:
+                # 今回使う姿勢が上限を超えるときはキャッシュせずに計算する
+                # （入れると今回ヒットした姿勢を捨てて上書きしてしまう）
+                new, inverse = np.unique(keys, return_inverse=True)
+                t = self._Angles(new)
+                self.misses += len(new)
+                self.hits += len(keys) - len(new)
+                return EulerMatrix(t, order), Euler2QuaternionArray(t, order), inverse.reshape(-1)
+            t = self._Angles(new)
+            self.evictions += table.insert(new, EulerMatrix(t, order), Euler2QuaternionArray(t, order), self._tick)
+            slots[miss] = table.find(keys[miss])
+            computed = len(new)
+        self.misses += computed
+        self.hits += len(keys) - computed
+        return table.R, table.q, slots
+
+    # 回転行列  th[3] または th[M,3]=オイラー角（ラジアンXYZ）, order=回転順
+    # return R[M,3,3]（EulerMatrix と同じ）
+    def matrices(self, th, order):
+        R, _, idx = self._Lookup(th, order)
+        return np.take(R, idx, axis=0)
+
+    # 1つの姿勢の回転行列 R[3,3]
+    def matrix(self, th, order):
+        return self.matrices(th, order)[0]
+
+    # クオータニオン  th[3] または th[M,3]=オイラー角（ラジアンXYZ）, order=回転順
+    # return q[M,4] (w,x,y,z)（Euler2QuaternionArray と同じ）
+    def quaternions(self, th, order):
+        _, q, idx = self._Lookup(th, order)
+        return np.take(q, idx, axis=0)
+
+    # 1つの姿勢のクオータニオン q[4]
+    def quaternion(self, th, order):
+        return self.quaternions(th, order)[0]
+
+    # ヒット・ミス・捨てた数
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'size': len(self), 'maxsize': self.maxsize,
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def clear(self):
+        self._tables.clear()
+        self.hits = self.misses = self.evictions = 0
+
+
+# RotationCache の回転順1つ分の保存場所
+#  keys[S], slots[S] = 保存したキーと保存場所
+#  hkeys[H], hslots[H] = キーを探すハッシュ表（オープンアドレス法  空きは-1、Hは2の累乗で4*maxsize以上）
+#  R[maxsize,3,3], q[maxsize,4] = 保存した姿勢,  used[maxsize] = 最後に使った回
+class _CacheTable:
+    def __init__(self, maxsize):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.slots = np.empty(0, dtype=np.int64)
+        self.bits = max(int(np.ceil(np.log2(4 * maxsize))), 4)
+        self.hkeys = np.full(1 << self.bits, -1, dtype=np.int64)
+        self.hslots = np.zeros(1 << self.bits, dtype=np.int64)
+        self.R = np.empty((maxsize, 3, 3))
+        self.q = np.empty((maxsize, 4))
+        self.used = np.full(maxsize, -1, dtype=np.int64)
+
+    # ハッシュ表の最初に調べる位置
+    def _Hash(self, keys):
+        h = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        return (h >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    # キー[M]の保存場所[M]（ないものは-1）  空きに当たるまで隣を調べる
+    def find(self, keys):
+        out = np.full(len(keys), -1, dtype=np.int64)
+        mask = (1 << self.bits) - 1
+        pos = self._Hash(keys)
+        todo = np.arange(len(keys))
+        while len(todo):
+            hk = self.hkeys[pos]
+            hit = hk == keys
+            out[todo[hit]] = self.hslots[pos[hit]]
+            rest = ~hit & (hk != -1)
+            todo, keys, pos = todo[rest], keys[rest], (pos[rest] + 1) & mask
+        return out
+
+    # ハッシュ表を作り直す
+    def _Rebuild(self):
+        self.hkeys.fill(-1)
+        mask = (1 << self.bits) - 1
+        pos = self._Hash(self.keys)
+        todo = np.arange(len(self.keys))
+        while len(todo):
+            empty = self.hkeys[pos] == -1
+            # 同じ空きを狙うキーは1つだけ入れ、残りは隣へ
+            p, first = np.unique(pos[empty], return_index=True)
+            win = todo[empty][first]
+            self.hkeys[p] = self.keys[win]
+            self.hslots[p] = self.slots[win]
+            placed = np.zeros(len(todo), dtype=bool)
+            placed[np.flatnonzero(empty)[first]] = True
+            todo, pos = todo[~placed], pos[~placed]
+            pos = np.where(self.hkeys[pos] == -1, pos, (pos + 1) & mask)
+
+    # 新しいキー[n]（重複なし）を保存  空きがなければ最も長く使っていない場所を使う
+    # used が tick の場所（今回使う姿勢）は捨てないので、n は空きと tick より前の場所の数以下にする
+    # return 捨てた数
+    def insert(self, keys, R, q, tick):
+        size = len(self.R)
+        n = len(keys)
+        free = size - len(self.keys)
+        evict = max(n - free, 0)
+
+        slots = np.arange(len(self.keys), len(self.keys) + min(n, free))
+        keep = np.ones(len(self.keys), dtype=bool)
+        if evict:
+            used = self.used[self.slots]
+            if evict > np.count_nonzero(used < tick):
+                raise RuntimeError('cache entries in use would be evicted')
+            old = np.argpartition(used, evict - 1)[:evict]
+            keep[old] = False
+            slots = np.concatenate([slots, self.slots[old]])
+
+        self.R[slots] = R
+        self.q[slots] = q
+        self.used[slots] = tick
+        self.keys = np.concatenate([self.keys[keep], keys])
+        self.slots = np.concatenate([self.slots[keep], slots])
+        self._Rebuild()
+        return evict
+
+
+# 一定の刻みの角度の1軸回転の表
+# 各軸の回転行列・クオータニオンを step 刻みで先に計算しておき、
+# 姿勢は回転順の最初の2軸の組の表を引いて、3軸目の回転を掛けて作る（sin/cosの計算なし）
+# 組の表は回転順ごとに最初に使うときに作る（組の数が PAIRS を超えるときは作らず3つの表の積にする）
+# step=角度の刻み（ラジアン）, limit=表にする角度の範囲 ±limit（ラジアン）
+# step の倍数でない角度や範囲外の角度を含む姿勢は EulerMatrix / Euler2QuaternionArray で計算する
+class AxisStepTable:
+    PAIRS = 1 << 20     # 組の表の大きさの上限（2度刻み・±2πで約13万組、行列で約9MB）
+
+    def __init__(self, step, limit=2.0*np.pi):
+        if step <= 0:
+            raise ValueError('step must be positive')
+        self.step = step
+        self.count = int(np.ceil(limit / step))
+        a = np.arange(-self.count, self.count + 1) * step
+        s, c = np.sin(a), np.cos(a)
+        self._sin, self._cos = s, c
+        self._half_sin, self._half_cos = np.sin(a / 2.0), np.cos(a / 2.0)
+        self._pairs = {}        # (種類, 回転順) -> 組の表
+
+        # 軸ごとの回転行列 [3(軸), K, 3, 3]
+        R = np.zeros((3, len(a), 3, 3))
+        R[0,:,0,0] = 1;  R[0,:,1,1] = c;  R[0,:,1,2] = -s; R[0,:,2,1] = s;  R[0,:,2,2] = c
+        R[1,:,0,0] = c;  R[1,:,0,2] = s;  R[1,:,1,1] = 1;  R[1,:,2,0] = -s; R[1,:,2,2] = c
+        R[2,:,0,0] = c;  R[2,:,0,1] = -s; R[2,:,1,0] = s;  R[2,:,1,1] = c;  R[2,:,2,2] = 1
+        self.axis_matrices = R
+
+        # 軸ごとのクオータニオン [3(軸), K, 4]
+        q = np.zeros((3, len(a), 4))
+        q[:,:,0] = self._half_cos
+        for ax in range(3):
+            q[ax,:,ax+1] = self._half_sin
+        self.axis_quaternions = q
+
+    # 表の番号 [M,3] と表で作れる姿勢か [M]（3つの角度がすべて step の倍数で範囲内）
+    def _Index(self, th):
+        x = th / self.step
+        k = np.rint(x)
+        x -= k
+        on = (np.abs(x) <= 1e-9) & (np.abs(k) <= self.count)
+        return k.astype(np.int64) + self.count, on[:, 0] & on[:, 1] & on[:, 2]
+
+    # 回転順の最初の2軸の組の表  matrix: [K*K,3,3], quaternion: [K*K,4]（大きすぎるときは None）
+    def _Pairs(self, kind, order):
+        key = (kind, order)
+        if key not in self._pairs:
+            K = 2 * self.count + 1
+            a0, a1, _ = OrderAxes(order)
+            if K * K > self.PAIRS:
+                self._pairs[key] = None
+            elif kind == 'matrix':
+                T = self.axis_matrices
+                self._pairs[key] = np.matmul(T[a0][:, None], T[a1][None, :]).reshape(K * K, 3, 3)
+            else:
+                T = self.axis_quaternions
+                self._pairs[key] = QuaternionMultiply(T[a0][:, None], T[a1][None, :]).reshape(K * K, 4)
+        return self._pairs[key]
+
+    # 表の番号 k[M,3] の姿勢の回転行列 R[M,3,3]
+    def _Matrices(self, k, order):
+        a0, a1, a2 = OrderAxes(order)
+        P = self._Pairs('matrix', order)
+        if P is None:
+            T = self.axis_matrices
+            return np.matmul(np.matmul(T[a0, k[:,a0]], T[a1, k[:,a1]]), T[a2, k[:,a2]])
+
+        # 3軸目の回転を右から掛ける  列 a2 はそのまま、残りの2列 j, l を cos, sin で混ぜる
+        p = np.take(P, k[:, a0] * (2 * self.count + 1) + k[:, a1], axis=0)
+        c = np.take(self._cos, k[:, a2])[:, None]
+        s = np.take(self._sin, k[:, a2])[:, None]
+        j, l = (a2 + 1) % 3, (a2 + 2) % 3
+        R = np.empty_like(p)
+        R[:, :, a2] = p[:, :, a2]
+        R[:, :, j] = p[:, :, j] * c + p[:, :, l] * s
+        R[:, :, l] = p[:, :, l] * c - p[:, :, j] * s
+        return R
+
+    # 表の番号 k[M,3] の姿勢のクオータニオン q[M,4]
+    def _Quaternions(self, k, order):
+        a0, a1, a2 = OrderAxes(order)
+        P = self._Pairs('quaternion', order)
+        if P is None:
+            T = self.axis_quaternions
+            return QuaternionMultiply(QuaternionMultiply(T[a0, k[:,a0]], T[a1, k[:,a1]]), T[a2, k[:,a2]])
+
+        # 3軸目の回転 (cos, sin*軸) を右から掛ける
+        p = np.take(P, k[:, a0] * (2 * self.count + 1) + k[:, a1], axis=0)
+        c = np.take(self._half_cos, k[:, a2])
+        s = np.take(self._half_sin, k[:, a2])
+        a, j, l = a2 + 1, (a2 + 1) % 3 + 1, (a2 + 2) % 3 + 1
+        q = np.empty_like(p)
+        q[:, 0] = p[:, 0] * c - p[:, a] * s
+        q[:, a] = p[:, a] * c + p[:, 0] * s
+        q[:, j] = p[:, j] * c + p[:, l] * s
+        q[:, l] = p[:, l] * c - p[:, j] * s
+        return q
+
+    # 回転行列  th[3] または th[M,3]=オイラー角（ラジアンXYZ）, order=回転順
+    # return R[M,3,3]（EulerMatrix と同じ）
+    def matrices(self, th, order):
+        th = np.atleast_2d(np.asarray(th, dtype=float))
+        k, on = self._Index(th)
+        if on.all():
+            return self._Matrices(k, order)
+        R = np.empty((len(th), 3, 3))
+        R[on] = self._Matrices(k[on], order)
+        R[~on] = EulerMatrix(th[~on], order)
+        return R
+
+    # クオータニオン  th[3] または th[M,3]=オイラー角（ラジアンXYZ）, order=回転順
+    # return q[M,4] (w,x,y,z)（Euler2QuaternionArray と同じ）
+    def quaternions(self, th, order):
+        th = np.atleast_2d(np.asarray(th, dtype=float))
+        k, on = self._Index(th)
+        if on.all():
+            return self._Quaternions(k, order)
+        q = np.empty((len(th), 4))
+        q[on] = self._Quaternions(k[on], order)
+        q[~on] = Euler2QuaternionArray(th[~on], order)
+        return q
+
+
+# 回転順を配列順に並べる
+# return [3] 回転する軸の番号 (0=X, 1=Y, 2=Z)
+def OrderAxes(order):
+    if order == EulerOrder.XYZ:   od = [0,1,2]
+    elif order == EulerOrder.XZY: od = [0,2,1]
+    elif order == EulerOrder.YXZ: od = [1,0,2]
+    elif order == EulerOrder.YZX: od = [1,2,0]
+    elif order == EulerOrder.ZXY: od = [2,0,1]
+    elif order == EulerOrder.ZYX: od = [2,1,0]
+    else:
+        raise ValueError('unknown EulerOrder: ' + str(order))
+    return od
+
+
+# 軸ごとの回転の全フレーム
+#  angles[F,3]   = 各フレームのオイラー角（度）
+#  axes[F]       = 各フレームで回転中の軸 (0=X, 1=Y, 2=Z)
+#  matrices[F,3,3] = 各フレームの回転行列
+#  model[F,7,3]  = 各フレームの紙飛行機の座標
+#  vectors[F,3,3] = 各フレームの回転軸のベクトル（vectors[f,ra] が回転中の軸）
+class EulerSweepFrames(NamedTuple):
+    angles: np.ndarray
+    axes: np.ndarray
+    matrices: np.ndarray
+    model: np.ndarray
+    vectors: np.ndarray
+
+
+# オイラー角の回転順に1軸ずつ回転するフレームをまとめて計算
+# angle[3]=目標姿勢のオイラー角（度）,
+# order=回転順,
+# step=1フレームあたりの回転角（度）,
+# pause=軸を切り替えるときに止めるフレーム数,
+# cache=RotationCache または AxisStepTable（回転行列を表から引く、省略時は毎回計算）
+# return EulerSweepFrames
+def EulerSweep(angle, order, step=2.0, pause=10, cache=None):
+    if step <= 0:
+        raise ValueError('step must be positive')
+    target = np.asarray(angle, dtype=float)
+    od = OrderAxes(order)
+
+    # 各軸の角度の並び 0度から目標まで step ずつ（最後は目標角度で止める）
+    angles = [np.zeros((1,3))]
+    axes = [np.full(1, od[0])]
+    current = np.zeros(3)
+    for OrderNo, ra in enumerate(od):
+        n = int(np.ceil(abs(target[ra]) / step))
+        seg = np.repeat(current[None,:], n, axis=0)
+        seg[:,ra] = np.sign(target[ra]) * np.minimum(np.arange(1, n+1) * step, abs(target[ra]))
+        current[ra] = target[ra]
+        angles.append(seg)
+        axes.append(np.full(n, ra))
+
+        # 次の軸へ移る前に止める
+        if OrderNo < 2 and pause > 0:
+            angles.append(np.repeat(current[None,:], pause, axis=0))
+            axes.append(np.full(pause, ra))
+
+    A = np.concatenate(angles)
+    R = (cache.matrices if cache is not None else EulerMatrix)(A * np.pi / 180.0, order)
+    P = np.column_stack(plane([0,0,0]))
+
+    return EulerSweepFrames(angles=A,
+                            axes=np.concatenate(axes),
+                            matrices=R,
+                            model=np.matmul(P, R.transpose(0, 2, 1)),
+                            vectors=R.transpose(0, 2, 1))   # 単位ベクトル e_i の回転 = R の列
+
+# 計算済みのフレームを保存
+def SaveSweep(path, sweep):
+    np.savez(path, **sweep._asdict())
+
+# 保存したフレームを読み込み（再計算なしで再生できる）
+def LoadSweep(path):
+    with np.load(path) as data:
+        return EulerSweepFrames(**{k: data[k] for k in EulerSweepFrames._fields})